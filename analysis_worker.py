@@ -0,0 +1,45 @@
+"""Worker process untuk analysis_jobs queue
+
+Contoh:
+    python analysis_worker.py --threads 4
+
+Jalankan beberapa worker untuk tambah throughput - job diagih dengan
+SELECT ... FOR UPDATE SKIP LOCKED, jadi setiap job diproses sekali sahaja.
+"""
+import argparse
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pinnalogy AI analysis worker")
+    parser.add_argument("--threads", type=int, default=None, help="TensorFlow intra-op threads")
+    parser.add_argument("--poll-interval", type=float, default=None)
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    from modules.job_queue import init_job_table, run_worker
+    from utils.helpers import get_setting, set_setting
+
+    if args.threads:
+        # Engine baca thread count dari setting semasa dibina
+        set_setting("analysis.runtime.intra_op_threads", args.threads)
+
+    # Worker proses satu job pada satu masa - tiada gunanya tunggu batching window
+    set_setting("analysis.batching.enabled", False)
+    init_job_table()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    print("Analysis worker started")
+    run_worker(stop_event, args.poll_interval or get_setting("analysis.jobs.poll_interval", 0.5))
+    print("Analysis worker stopped")
+
+
+if __name__ == "__main__":
+    main()
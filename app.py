@@ -1,18 +1,28 @@
 import streamlit as st
 from datetime import datetime
-import numpy as np
-import pandas as pd
-from PIL import Image
-import cv2
 import time
+import threading
 import hashlib
 import json
-import os
-import psycopg2
+import io
 from dotenv import load_dotenv
+from database.connection import connection, pool_stats
+from database.models import ensure_schema
+from database.schema import has_column
+from modules.patients import list_patients, get_patient, get_patient_details, patient_stats
 import bcrypt
 import random
 from datetime import timedelta
+from modules.result_cache import get_result_cache
+from modules.previews import get_preview, get_overlay_preview, get_upload_quality
+from modules.job_queue import enqueue_job, get_job_status, run_worker
+from modules.analysis_store import (
+    save_ear_analysis, save_ear_analysis_pair, load_analysis_masks, get_patient_analyses
+)
+from utils.helpers import get_setting
+# numpy/OpenCV/PIL/TensorFlow (modules.ear_analysis, modules.overlay) di-import
+# dalam function yang guna sahaja - login page tidak perlu tunggu semua ini load.
+# Semak dengan: python check_import_time.py
 
 # Load environment variables
 load_dotenv()
@@ -37,27 +47,10 @@ def verify_password(password, hashed_password):
 
 # ==================== DATABASE FUNCTIONS ====================
 def init_database():
-    """Initialize database tables jika perlu"""
+    """Initialize database tables jika perlu - migrations bernombor dalam database/models.py"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        # Check jika tables sudah wujud dengan structure yang betul
-        cur.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'patients' AND column_name = 'user_id'
-        """)
-        has_user_id = cur.fetchone() is not None
-        
-        if not has_user_id:
-            # Update patients table jika perlu
-            cur.execute("""
-                ALTER TABLE patients ADD COLUMN IF NOT EXISTS user_id INTEGER
-            """)
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        # Sekali setiap process; rerun seterusnya tiada round trip
+        ensure_schema()
         return True
         
     except Exception as e:
@@ -67,48 +60,53 @@ def init_database():
 def test_database_connection():
     """Test database connection dan show current structure"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        st.success("✅ PostgreSQL Connection SUCCESSFUL!")
-        
-        # Get database info
-        cur.execute("SELECT version(), current_database()")
-        db_info = cur.fetchone()
-        st.write(f"**Database Version:** {db_info[0]}")
-        st.write(f"**Database Name:** {db_info[1]}")
-        
-        # Get table structures
-        st.write("**📊 Table Structures:**")
-        
-        # Check patients table
-        cur.execute("""
-            SELECT column_name, data_type, is_nullable 
-            FROM information_schema.columns 
-            WHERE table_name = 'patients' 
-            ORDER BY ordinal_position
-        """)
-        patient_columns = cur.fetchall()
-        
-        st.write("**Patients Table Columns:**")
-        for col in patient_columns:
-            st.write(f"- `{col[0]}` ({col[1]}, nullable: {col[2]})")
-        
-        # Check users table
-        cur.execute("SELECT COUNT(*) FROM users")
-        user_count = cur.fetchone()[0]
-        st.write(f"**Total Users:** {user_count}")
-        
-        # Show existing users
-        cur.execute("SELECT username, email, role, created_at FROM users")
-        users = cur.fetchall()
-        if users:
-            st.write("**👥 Existing Users:**")
-            for user in users:
-                st.write(f"- **{user[0]}** ({user[1]}) - {user[2]} - {user[3].strftime('%Y-%m-%d')}")
-        
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            st.success("✅ PostgreSQL Connection SUCCESSFUL!")
+        
+            # Get database info
+            cur.execute("SELECT version(), current_database()")
+            db_info = cur.fetchone()
+            st.write(f"**Database Version:** {db_info[0]}")
+            st.write(f"**Database Name:** {db_info[1]}")
+        
+            # Get table structures
+            st.write("**📊 Table Structures:**")
+        
+            # Check patients table
+            cur.execute("""
+                SELECT column_name, data_type, is_nullable 
+                FROM information_schema.columns 
+                WHERE table_name = 'patients' 
+                ORDER BY ordinal_position
+            """)
+            patient_columns = cur.fetchall()
+        
+            st.write("**Patients Table Columns:**")
+            for col in patient_columns:
+                st.write(f"- `{col[0]}` ({col[1]}, nullable: {col[2]})")
+        
+            # Check users table
+            cur.execute("SELECT COUNT(*) FROM users")
+            user_count = cur.fetchone()[0]
+            st.write(f"**Total Users:** {user_count}")
+        
+            # Show existing users
+            cur.execute("SELECT username, email, role, created_at FROM users")
+            users = cur.fetchall()
+            if users:
+                st.write("**👥 Existing Users:**")
+                for user in users:
+                    st.write(f"- **{user[0]}** ({user[1]}) - {user[2]} - {user[3].strftime('%Y-%m-%d')}")
+        
+            cur.close()
+        
+        stats = pool_stats()
+        if stats:
+            st.write(f"**🔌 Connection Pool:** {stats['open']}/{stats['max_size']} open "
+                     f"({stats['in_use']} in use, {stats['idle']} idle) · {stats['checkouts']} checkouts, "
+                     f"{stats['created']} connects, {stats['health_check_failures']} failed health checks")
         return True
         
     except Exception as e:
@@ -118,12 +116,11 @@ def test_database_connection():
 def get_user_id_from_db(username):
     """Get user ID from database"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM users WHERE username = %s", (username,))
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT id FROM users WHERE username = %s", (username,))
+            result = cur.fetchone()
+            cur.close()
         return result[0] if result else 1  # Default to 1 jika tidak jumpa
     except Exception as e:
         print(f"Error getting user ID: {e}")
@@ -133,15 +130,14 @@ def get_user_id_from_db(username):
 def authenticate_user(username, password):
     """Authenticate user with database"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT id, username, name, password_hash, role FROM users WHERE username = %s OR email = %s",
-            (username.lower(), username.lower())
-        )
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT id, username, name, password_hash, role FROM users WHERE username = %s OR email = %s",
+                (username.lower(), username.lower())
+            )
+            result = cur.fetchone()
+            cur.close()
         
         if result and verify_password(password, result[3]):
             return {
@@ -200,50 +196,45 @@ def login_user(username, password):
 def save_patient_to_db(patient_data):
     """Save patient to database - compatible dengan existing structure"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        # Check jika user_id column wujud
-        cur.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'patients' AND column_name = 'user_id'
-        """)
-        has_user_id = cur.fetchone() is not None
-        
-        if has_user_id:
-            # Insert dengan user_id
-            cur.execute("""
-                INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                st.session_state.user_id,
-                patient_data['patient_code'],
-                patient_data['full_name'],
-                patient_data['age'],
-                patient_data['gender'],
-                patient_data['contact_info'],
-                patient_data['medical_history']
-            ))
-        else:
-            # Insert tanpa user_id (backward compatibility)
-            cur.execute("""
-                INSERT INTO patients (patient_code, full_name, age, gender, contact_info, medical_history)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                patient_data['patient_code'],
-                patient_data['full_name'],
-                patient_data['age'],
-                patient_data['gender'],
-                patient_data['contact_info'],
-                patient_data['medical_history']
-            ))
-        
-        patient_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            # Check jika user_id column wujud (cached - tiada round trip ke information_schema)
+            has_user_id = has_column('patients', 'user_id', conn)
+        
+            if has_user_id:
+                # Insert dengan user_id
+                cur.execute("""
+                    INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    st.session_state.user_id,
+                    patient_data['patient_code'],
+                    patient_data['full_name'],
+                    patient_data['age'],
+                    patient_data['gender'],
+                    patient_data['contact_info'],
+                    patient_data['medical_history']
+                ))
+            else:
+                # Insert tanpa user_id (backward compatibility)
+                cur.execute("""
+                    INSERT INTO patients (patient_code, full_name, age, gender, contact_info, medical_history)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    patient_data['patient_code'],
+                    patient_data['full_name'],
+                    patient_data['age'],
+                    patient_data['gender'],
+                    patient_data['contact_info'],
+                    patient_data['medical_history']
+                ))
+        
+            patient_id = cur.fetchone()[0]
+            conn.commit()
+            cur.close()
         
         return True
         
@@ -251,105 +242,102 @@ def save_patient_to_db(patient_data):
         st.error(f"Database error: {str(e)}")
         return False
 
-def get_patients_from_db():
-    """Get patients from database - compatible dengan existing structure"""
+def patient_scope():
+    """user_id untuk filter patients - None (semua) untuk admin"""
+    return None if st.session_state.user_role == "admin" else st.session_state.user_id
+
+def paged_patients(key, **filters):
+    """Satu page patients (keyset) + butang Previous/Next - cursor disimpan dalam session_state"""
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        # Check jika user_id column wujud
-        cur.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'patients' AND column_name = 'user_id'
-        """)
-        has_user_id = cur.fetchone() is not None
-        
-        if has_user_id and st.session_state.user_role != "admin":
-            # Filter by user_id untuk non-admin users
-            cur.execute("""
-                SELECT id, patient_code, full_name, age, gender, contact_info, medical_history, created_at 
-                FROM patients 
-                WHERE user_id = %s
-                ORDER BY created_at DESC
-            """, (st.session_state.user_id,))
-        else:
-            # Get all patients (untuk admin atau jika tiada user_id column)
-            cur.execute("""
-                SELECT id, patient_code, full_name, age, gender, contact_info, medical_history, created_at 
-                FROM patients 
-                ORDER BY created_at DESC
-            """)
-        
-        patients = cur.fetchall()
-        cur.close()
-        conn.close()
-        return patients
-        
+        rows, next_cursor = list_patients(patient_scope(), after=cursors[-1], **filters)
     except Exception as e:
         st.error(f"Error loading patients: {e}")
         return []
+    
+    if len(cursors) > 1 or next_cursor is not None:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("⬅️ Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+                cursors.pop()
+                st.rerun()
+        with col2:
+            st.caption(f"Page {len(cursors)}")
+        with col3:
+            if st.button("Next ➡️", key=f"{key}_next", disabled=next_cursor is None):
+                cursors.append(next_cursor)
+                st.rerun()
+    return rows
+
+def reset_patient_pages(key):
+    """Filter berubah - mula semula dari page pertama"""
+    st.session_state[f"{key}_cursors"] = [None]
+
+def patient_details_section(patient, key, history=True):
+    """Contact & medical history di-load hanya bila user buka"""
+    if st.toggle("Show contact & history", key=f"{key}_details_{patient[0]}"):
+        details = get_patient_details(patient[0])
+        if details:
+            st.write(f"**Contact:** {details['contact_info']}")
+            if history:
+                st.write(f"**Medical History:** {details['medical_history']}")
 
 # ==================== SAMPLE DATA CREATION ====================
 def create_sample_patients():
     """Create sample patients dengan structure yang compatible"""
     
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        st.info("🔄 Creating sample patients...")
-        
-        # Sample data
-        malay_names = [
-            "Ahmad bin Abdullah", "Siti binti Hassan", "Mohammad bin Ismail", 
-            "Aishah binti Mohd", "Ali bin Ahmad", "Nor binti Omar",
-            "Razak bin Mahmud", "Zainab binti Sulaiman", "Hafiz bin Rahman",
-            "Fatimah binti Yusof"
-        ]
-        
-        # Clear existing sample data
-        cur.execute("DELETE FROM patients WHERE patient_code LIKE 'SMP%'")
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Create 10 sample patients (boleh adjust)
-        for i in range(1, 11):
-            patient_code = f"SMP{i:03d}"
-            full_name = random.choice(malay_names)
-            age = random.randint(20, 65)
-            gender = random.choice(["Male", "Female"])
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            st.info("🔄 Creating sample patients...")
+        
+            # Sample data
+            malay_names = [
+                "Ahmad bin Abdullah", "Siti binti Hassan", "Mohammad bin Ismail", 
+                "Aishah binti Mohd", "Ali bin Ahmad", "Nor binti Omar",
+                "Razak bin Mahmud", "Zainab binti Sulaiman", "Hafiz bin Rahman",
+                "Fatimah binti Yusof"
+            ]
+        
+            # Clear existing sample data
+            cur.execute("DELETE FROM patients WHERE patient_code LIKE 'SMP%'")
+        
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+        
+            # Create 10 sample patients (boleh adjust)
+            # Check user_id column sekali, bukan setiap row
+            has_user_id = has_column('patients', 'user_id', conn)
             
-            phone = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
-            contact_info = f"Phone: {phone}, Email: patient{patient_code}@example.com"
+            for i in range(1, 11):
+                patient_code = f"SMP{i:03d}"
+                full_name = random.choice(malay_names)
+                age = random.randint(20, 65)
+                gender = random.choice(["Male", "Female"])
             
-            conditions = ["Hypertension", "Diabetes", "Asthma", "None"]
-            medical_history = f"Conditions: {random.choice(conditions)}. Regular checkup patient."
+                phone = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
+                contact_info = f"Phone: {phone}, Email: patient{patient_code}@example.com"
             
-            # Check user_id column
-            cur.execute("""
-                SELECT column_name FROM information_schema.columns 
-                WHERE table_name = 'patients' AND column_name = 'user_id'
-            """)
-            has_user_id = cur.fetchone() is not None
+                conditions = ["Hypertension", "Diabetes", "Asthma", "None"]
+                medical_history = f"Conditions: {random.choice(conditions)}. Regular checkup patient."
             
-            if has_user_id:
-                cur.execute("""
-                    INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (st.session_state.user_id, patient_code, full_name, age, gender, contact_info, medical_history))
-            else:
-                cur.execute("""
-                    INSERT INTO patients (patient_code, full_name, age, gender, contact_info, medical_history)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, (patient_code, full_name, age, gender, contact_info, medical_history))
+                if has_user_id:
+                    cur.execute("""
+                        INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (st.session_state.user_id, patient_code, full_name, age, gender, contact_info, medical_history))
+                else:
+                    cur.execute("""
+                        INSERT INTO patients (patient_code, full_name, age, gender, contact_info, medical_history)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, (patient_code, full_name, age, gender, contact_info, medical_history))
             
-            status_text.text(f"Creating patient {i}/10: {full_name}")
-            progress_bar.progress(i / 10)
+                status_text.text(f"Creating patient {i}/10: {full_name}")
+                progress_bar.progress(i / 10)
         
-        conn.commit()
-        cur.close()
-        conn.close()
+            conn.commit()
+            cur.close()
         
         st.success("🎉 Successfully created sample patients!")
         time.sleep(2)
@@ -369,35 +357,93 @@ EAR_REFLEXOLOGY_MAP = {
 }
 
 # ===== AI ANALYSIS FUNCTIONS =====
-def analyze_systemic_health_via_ear(image):
-    """Simple ear analysis simulation"""
+def warmup_analysis_engine():
+    """Load & warm up segmentation model sekali per server process"""
     try:
-        zones = random.sample(list(EAR_REFLEXOLOGY_MAP.keys()), random.randint(2, 4))
-        
-        analysis_results = {
-            'detected_zones': zones,
-            'color_analysis': {"status": "Normal coloration patterns detected"},
-            'texture_analysis': {"status": "Healthy skin texture observed"},
-            'structural_features': ["Well-defined ear structure"],
-            'potential_concerns': random.choice([[], ["Recommend hydration improvement"], ["Good overall health"]]),
-            'recommended_checks': ["Routine health screening"],
-            'lifestyle_suggestions': ["Maintain balanced diet and exercise"],
-            'confidence_level': random.choice(["high", "moderate"]),
-            'analysis_date': datetime.now().isoformat()
-        }
-        
-        return analysis_results
-        
+        from modules.ear_analysis import get_engine
+        get_engine()
+        return True
+    except Exception as e:
+        print(f"Model warmup warning: {e}")
+        return False
+
+@st.cache_resource(show_spinner=False)
+def preload_analysis_engine():
+    """Background thread selepas login - import TensorFlow & warm up model tanpa block UI"""
+    loader = threading.Thread(target=warmup_analysis_engine, name="analysis-engine-preload", daemon=True)
+    loader.start()
+    return loader
+
+@st.cache_resource(show_spinner=False)
+def start_embedded_worker():
+    """Analysis worker threads per server process (shared across sessions)
+
+    Beberapa thread supaya job serentak masuk micro-batch yang sama
+    (analysis.jobs.embedded_workers, biasanya <= batching.max_batch_size).
+    """
+    stop_event = threading.Event()
+    for i in range(max(1, int(get_setting("analysis.jobs.embedded_workers", 4)))):
+        worker = threading.Thread(
+            target=run_worker,
+            args=(stop_event, get_setting("analysis.jobs.poll_interval", 0.5)),
+            name=f"embedded-analysis-worker-{i}",
+            daemon=True
+        )
+        worker.start()
+    return stop_event
+
+def fallback_analysis_results():
+    """Result generic bila analysis gagal"""
+    return {
+        'detected_zones': ["general_ear_structure"],
+        'color_analysis': {"status": "Analysis completed"},
+        'texture_analysis': {"status": "Analysis completed"},
+        'structural_features': ["Standard ear anatomy"],
+        'potential_concerns': [],
+        'recommended_checks': ["Routine checkup"],
+        'confidence_level': "moderate"
+    }
+
+def analyze_uploaded_ear(image_bytes, image, tiled=None, patient_id=None, tta=False):
+    """Analysis dengan result cache - image & model sama tidak perlu forward pass lagi"""
+    try:
+        from modules.ear_analysis import analyze_image_bytes
+        # Salinan - result mungkin object dari memory cache
+        analysis_results = dict(analyze_image_bytes(image_bytes, image, tiled, tta))
     except Exception as e:
-        return {
-            'detected_zones': ["general_ear_structure"],
-            'color_analysis': {"status": "Analysis completed"},
-            'texture_analysis': {"status": "Analysis completed"},
-            'structural_features': ["Standard ear anatomy"],
-            'potential_concerns': [],
-            'recommended_checks': ["Routine checkup"],
-            'confidence_level': "moderate"
-        }
+        print(f"Analysis error: {e}")
+        return fallback_analysis_results()
+    
+    if patient_id is not None and not analysis_results.get('rejected'):
+        try:
+            with connection() as conn:
+                analysis_results['analysis_id'] = save_ear_analysis(conn, patient_id, analysis_results)
+        except Exception as e:
+            print(f"Error saving analysis: {e}")
+    
+    analysis_results.pop('mask_data', None)
+    return analysis_results
+
+def analyze_uploaded_pair(left_bytes, right_bytes, patient_id=None):
+    """Paired analysis (sync path bila jobs disabled) - simpan kedua-dua side"""
+    try:
+        from modules.ear_analysis import analyze_pair_bytes
+        results = analyze_pair_bytes(left_bytes, right_bytes)
+    except Exception as e:
+        print(f"Analysis error: {e}")
+        st.error(f"❌ Analysis failed: {e}")
+        return None
+    
+    if patient_id is not None:
+        try:
+            with connection() as conn:
+                save_ear_analysis_pair(conn, patient_id, results)
+        except Exception as e:
+            print(f"Error saving analysis: {e}")
+    
+    for side in ("left", "right"):
+        results[side].pop('mask_data', None)
+    return results
 
 # ===== PAGE FUNCTIONS =====
 def login_page():
@@ -434,13 +480,18 @@ def dashboard_page():
     """Main dashboard after login"""
     st.header(f"🏠 Welcome, {st.session_state.user_name}!")
     
-    patients = get_patients_from_db()
+    try:
+        stats = patient_stats(patient_scope())
+        patients = list_patients(patient_scope(), limit=5)[0]
+    except Exception as e:
+        st.error(f"Error loading patients: {e}")
+        stats, patients = {'total': 0}, []
     
     # Quick stats
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Patients", len(patients))
+        st.metric("Total Patients", stats['total'])
     
     with col2:
         st.metric("Today's Analyses", "0")
@@ -473,11 +524,11 @@ def dashboard_page():
     # Recent patients
     st.subheader("📈 Recent Patients")
     if patients:
-        for patient in patients[:5]:
+        for patient in patients:
             with st.expander(f"👤 {patient[2]} - {patient[1]}"):
                 st.write(f"**Age:** {patient[3]}")
                 st.write(f"**Gender:** {patient[4]}")
-                st.write(f"**Registered:** {patient[7].strftime('%Y-%m-%d')}")
+                st.write(f"**Registered:** {patient[5].strftime('%Y-%m-%d')}")
     else:
         st.info("No patients yet. Add your first patient to get started!")
 
@@ -485,8 +536,6 @@ def patient_management_page():
     """Patient management system"""
     st.header("👥 Patient Management")
     
-    patients = get_patients_from_db()
-    
     tab1, tab2 = st.tabs(["➕ Add New Patient", "📋 Patient List"])
     
     with tab1:
@@ -531,8 +580,11 @@ def patient_management_page():
     with tab2:
         st.subheader("Patient Records")
         
+        search = st.text_input("🔎 Search by name or code", key="patients_search",
+                               on_change=reset_patient_pages, args=("patients",))
+        patients = paged_patients("patients", search=search)
+        
         if patients:
-            st.success(f"✅ Found {len(patients)} patients")
             for patient in patients:
                 with st.expander(f"👤 {patient[2]} - {patient[1]}"):
                     col1, col2 = st.columns(2)
@@ -545,13 +597,14 @@ def patient_management_page():
                     
                     with col2:
                         st.write("**Contact & History:**")
-                        st.write(f"**Contact:** {patient[5]}")
-                        st.write(f"**Medical History:** {patient[6]}")
+                        patient_details_section(patient, "patients")
                     
                     if st.button(f"🔍 Analyze Ear", key=patient[0]):
                         st.session_state.selected_patient = patient[1]
                         st.session_state.current_page = "Ear Analysis"
                         st.rerun()
+        elif search:
+            st.info("🔎 No patients match your search.")
         else:
             st.info("📝 No patients found. Add your first patient above.")
 
@@ -559,8 +612,23 @@ def ear_analysis_page():
     """Ear analysis with patient selection"""
     st.header("🔍 Ear Analysis")
     
-    patients = get_patients_from_db()
+    # Carian dalam SQL - selectbox hanya senaraikan satu page, bukan semua patients
+    search = st.text_input("🔎 Find patient by name or code", key="analysis_patient_search")
+    try:
+        patients = list_patients(patient_scope(), limit=50, search=search)[0]
+        # Patient dari butang "Analyze Ear" mungkin tiada dalam page ini
+        preselected = st.session_state.get('selected_patient')
+        if preselected and not search and all(p[1] != preselected for p in patients):
+            patient = get_patient(preselected, patient_scope())
+            if patient is not None:
+                patients.insert(0, patient)
+    except Exception as e:
+        st.error(f"Error loading patients: {e}")
+        patients = []
     
+    if not patients and search:
+        st.info("🔎 No patients match your search.")
+        return
     if not patients:
         st.warning("No patients found. Please add a patient first.")
         if st.button("➕ Add New Patient"):
@@ -570,13 +638,26 @@ def ear_analysis_page():
     
     # Patient selection
     patient_options = {patient[1]: f"{patient[2]} ({patient[1]})" for patient in patients}
-    selected_patient_code = st.selectbox("👤 Select Patient", options=list(patient_options.keys()), 
+    codes = list(patient_options.keys())
+    preselected = st.session_state.get('selected_patient')
+    selected_patient_code = st.selectbox("👤 Select Patient", options=codes, 
+                                       index=codes.index(preselected) if preselected in codes else 0,
                                        format_func=lambda x: patient_options[x])
     
     if selected_patient_code:
         selected_patient = next((p for p in patients if p[1] == selected_patient_code), None)
         
         if selected_patient:
+            paired = st.toggle(
+                "👂👂 Paired mode (left & right ears)",
+                key=f"paired_{selected_patient_code}",
+                help="Analyze both ears in one batched pass and compare left-right asymmetry"
+            )
+            if paired:
+                paired_analysis_section(selected_patient, selected_patient_code)
+                previous_analyses_section(selected_patient)
+                return
+            
             col1, col2 = st.columns(2)
             
             with col1:
@@ -595,20 +676,209 @@ def ear_analysis_page():
                 )
                 
                 if uploaded_file is not None:
-                    image = Image.open(uploaded_file)
-                    st.image(image, caption="Uploaded Ear Image", use_column_width=True)
+                    # Rerun tidak decode upload - header untuk mode tiled, preview & quality
+                    # dicache ikut content hash; decode penuh hanya bila Analyze (tanpa job queue)
+                    from modules.ear_analysis import upload_is_tiled
+                    image_bytes = uploaded_file.getvalue()
+                    image = None
+                    tiled = upload_is_tiled(image_bytes)
+                    st.image(get_preview(image_bytes), caption="Uploaded Ear Image", use_column_width=True)
                     
-                    if st.button("🧠 Analyze Ear", type="primary", use_container_width=True):
-                        with st.spinner("🤖 AI is analyzing ear reflexology patterns..."):
-                            time.sleep(2)
-                            
-                            analysis_results = analyze_systemic_health_via_ear(image)
-                            st.success("✅ Analysis completed!")
-                            
-                            # Display results
-                            display_analysis_results(analysis_results, selected_patient)
-
-def display_analysis_results(insights, patient_info):
+                    # Quality gate murah sebelum model - scan Poor tidak dihantar
+                    quality = None
+                    if get_setting("analysis.quality.enabled", True):
+                        quality = get_upload_quality(image_bytes)
+                        if quality['usable']:
+                            st.caption(f"📷 Scan quality: **{quality['grade']}**")
+                        else:
+                            st.warning("⚠️ Scan quality too low: " + "; ".join(quality['issues']) + ". Please retake the photo.")
+                    
+                    job_key = f"analysis_job_{selected_patient_code}_{getattr(uploaded_file, 'file_id', uploaded_file.name)}"
+                    
+                    tta = st.checkbox(
+                        "🎯 High-accuracy mode (TTA)",
+                        help="Average flipped & rescaled variants in one batched pass - for borderline scans",
+                        disabled=tiled
+                    )
+                    
+                    if st.button("🧠 Analyze Ear", type="primary", use_container_width=True,
+                                 disabled=quality is not None and not quality['usable']):
+                        if get_setting("analysis.jobs.enabled", True):
+                            # Enqueue sahaja - worker yang run model, script thread tidak block
+                            try:
+                                st.session_state[job_key] = enqueue_job(
+                                    image_bytes, selected_patient[0], st.session_state.user_id, tta
+                                )
+                                st.session_state.pop(f"{job_key}_result", None)
+                            except Exception as e:
+                                st.error(f"❌ Failed to queue analysis: {e}")
+                        else:
+                            with st.spinner("🤖 AI is analyzing ear reflexology patterns..."):
+                                # Decode pada resolusi yang model perlukan (JPEG draft mode)
+                                from modules.ear_analysis import load_upload
+                                image, tiled = load_upload(io.BytesIO(image_bytes))
+                                analysis_results = analyze_uploaded_ear(image_bytes, image, tiled, selected_patient[0], tta)
+                                st.success("✅ Analysis completed!")
+                                
+                                # Display results
+                                display_analysis_results(analysis_results, selected_patient, image_bytes, image)
+                                show_cache_stats()
+            
+            if uploaded_file is not None and job_key in st.session_state:
+                job = st.session_state.get(f"{job_key}_result")
+                if job is None:
+                    analysis_job_status(job_key, selected_patient)
+                elif job['status'] == "done":
+                    st.success("✅ Analysis completed!")
+                    display_analysis_results(job['result'], selected_patient, image_bytes, image)
+                else:
+                    st.error(f"❌ Analysis failed: {job['error']}")
+            
+            previous_analyses_section(selected_patient)
+
+def paired_analysis_section(patient_info, patient_code):
+    """Upload kedua-dua telinga - satu job, satu forward pass (batch 2)"""
+    st.write(f"**Patient:** {patient_info[2]} | **Age:** {patient_info[3]} | **Gender:** {patient_info[4]}")
+    
+    uploads = {}
+    images = {}  # side -> (bytes, None) untuk preview & overlay - tiada decode setiap rerun
+    for side, col in zip(("left", "right"), st.columns(2)):
+        with col:
+            st.subheader(f"{side.title()} Ear")
+            uploads[side] = st.file_uploader(
+                f"📷 Upload {side.title()} Ear Image",
+                type=['jpg', 'jpeg', 'png'],
+                key=f"upload_{side}_{patient_code}"
+            )
+            if uploads[side] is not None:
+                images[side] = (uploads[side].getvalue(), None)
+                st.image(get_preview(images[side][0]), caption=f"{side.title()} Ear", use_column_width=True)
+    
+    if uploads['left'] is None or uploads['right'] is None:
+        st.info("Upload both ears to run a paired analysis.")
+        return
+    
+    job_key = "analysis_pair_{}_{}_{}".format(
+        patient_code, *(getattr(uploads[side], 'file_id', uploads[side].name) for side in ("left", "right"))
+    )
+    
+    if st.button("🧠 Analyze Both Ears", type="primary", use_container_width=True):
+        left_bytes, right_bytes = images['left'][0], images['right'][0]
+        if get_setting("analysis.jobs.enabled", True):
+            try:
+                st.session_state[job_key] = enqueue_job(
+                    left_bytes, patient_info[0], st.session_state.user_id, right_image_bytes=right_bytes
+                )
+                st.session_state.pop(f"{job_key}_result", None)
+            except Exception as e:
+                st.error(f"❌ Failed to queue analysis: {e}")
+        else:
+            with st.spinner("🤖 AI is analyzing both ears..."):
+                results = analyze_uploaded_pair(left_bytes, right_bytes, patient_info[0])
+            if results is not None:
+                display_pair_results(results, patient_info, images)
+    
+    if job_key in st.session_state:
+        job = st.session_state.get(f"{job_key}_result")
+        if job is None:
+            analysis_job_status(job_key, patient_info)
+        elif job['status'] == "done":
+            st.success("✅ Analysis completed!")
+            display_pair_results(job['result'], patient_info, images)
+        else:
+            st.error(f"❌ Analysis failed: {job['error']}")
+
+def display_pair_results(results, patient_info, images=None):
+    """Result kiri & kanan bersebelahan + asymmetry per region; images = side -> (bytes, image)"""
+    from modules.ear_analysis import EAR_REGIONS
+    
+    st.subheader("🎯 Paired Analysis Results")
+    
+    asymmetry = results.get('asymmetry')
+    if asymmetry:
+        st.write(f"**Left-Right Asymmetry** (mean index {asymmetry['mean_asymmetry_index']:.1f}%)")
+        cols = st.columns(len(EAR_REGIONS) + 1)
+        for col, region in zip(cols, EAR_REGIONS + ("total",)):
+            metrics = asymmetry['regions'][region]
+            col.metric(
+                region.title(), f"{metrics['asymmetry_index']:.1f}%",
+                help=f"Left {metrics['left']:.1f}% / Right {metrics['right']:.1f}%"
+            )
+            col.caption(f"L {metrics['left']:.1f}% · R {metrics['right']:.1f}%")
+    
+    for side, col in zip(("left", "right"), st.columns(2)):
+        insights = results[side]
+        with col:
+            st.write(f"**{side.title()} Ear**")
+            if insights.get('rejected'):
+                st.warning("⚠️ " + "; ".join(insights['potential_concerns']))
+                continue
+            coverage = insights.get('region_coverage')
+            if coverage:
+                st.write(f"Total coverage: {coverage['total_coverage']:.1f}% "
+                         f"(confidence {coverage['analysis_confidence']:.2f})")
+            st.write(f"• **Colour:** {insights['color_analysis'].get('status', '')}")
+            st.write(f"• **Texture:** {insights['texture_analysis'].get('status', '')}")
+            for concern in insights['potential_concerns']:
+                st.write(f"• ⚠️ {concern}")
+            if insights.get('analysis_id'):
+                overlay = get_overlay_preview(insights['analysis_id'], load_analysis_masks, *(images or {}).get(side, ()))
+                if overlay is not None:
+                    st.image(overlay, caption=f"{side.title()} Segmentation", use_column_width=True)
+    
+    if results.get('model_version'):
+        st.caption(f"Model: {results['model_version']}")
+
+def previous_analyses_section(patient_info):
+    """Analysis lama untuk patient - overlay dirender dari mask_data, tiada forward pass"""
+    try:
+        analyses = get_patient_analyses(patient_info[0])
+    except Exception as e:
+        print(f"Error loading analyses: {e}")
+        return
+    
+    if not analyses:
+        return
+    
+    with st.expander(f"📜 Previous Analyses ({len(analyses)})"):
+        for analysis_id, created_at, coverage, has_masks, model_version in analyses:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                summary = f"Total coverage {coverage['total_coverage']:.1f}%" if coverage else "No coverage data"
+                if model_version:
+                    summary += f" · {model_version}"
+                st.write(f"**{created_at.strftime('%Y-%m-%d %H:%M')}** - {summary}")
+            with col2:
+                show = has_masks and st.button("🖼️ Overlay", key=f"overlay_{analysis_id}")
+            if show:
+                overlay = get_overlay_preview(analysis_id, load_analysis_masks)
+                if overlay is not None:
+                    st.image(overlay, caption=f"Segmentation ({model_version})", use_column_width=True)
+
+def show_cache_stats():
+    """Hit/miss counters result cache"""
+    cache = get_result_cache()
+    if cache is not None:
+        stats = cache.stats()
+        st.caption(f"Result cache: {stats['memory_hits'] + stats['disk_hits']} hits / "
+                   f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+@st.fragment(run_every=1.0)
+def analysis_job_status(job_key, patient_info):
+    """Poll status job setiap saat - rerun penuh bila result siap"""
+    job = get_job_status(st.session_state[job_key])
+    
+    if job is None:
+        st.error("❌ Analysis job not found")
+    elif job['status'] == "queued":
+        st.info(f"⏳ Analysis queued (position {job['queue_position'] + 1})...")
+    elif job['status'] == "running":
+        st.info("🤖 AI is analyzing ear reflexology patterns...")
+    else:
+        st.session_state[f"{job_key}_result"] = job
+        st.rerun()
+
+def display_analysis_results(insights, patient_info, image_bytes=None, image=None):
     """Display analysis results"""
     st.subheader("🎯 Analysis Results")
     
@@ -622,6 +892,21 @@ def display_analysis_results(insights, patient_info):
             for zone in insights['detected_zones']:
                 related_organs = EAR_REFLEXOLOGY_MAP.get(zone, ["General area"])
                 st.write(f"• **{zone.title()}**: {', '.join(related_organs)}")
+        
+        coverage = insights.get('region_coverage')
+        if coverage:
+            from modules.ear_analysis import EAR_REGIONS
+            st.write("**Region Coverage:**")
+            cols = st.columns(len(EAR_REGIONS) + 1)
+            for col, region in zip(cols, EAR_REGIONS):
+                col.metric(region.title(), f"{coverage[f'{region}_coverage']:.1f}%")
+            cols[-1].metric("Total", f"{coverage['total_coverage']:.1f}%")
+        
+        if insights.get('analysis_id'):
+            # Overlay atas preview kecil, dicache ikut analysis - rerun tidak fetch masks lagi
+            overlay = get_overlay_preview(insights['analysis_id'], load_analysis_masks, image_bytes, image)
+            if overlay is not None:
+                st.image(overlay, caption="Segmentation Overlay", use_column_width=True)
     
     with tab2:
         if insights['color_analysis']:
@@ -648,36 +933,42 @@ def display_analysis_results(insights, patient_info):
                 st.write(f"• {check}")
         
         st.write(f"**Confidence Level:** {insights.get('confidence_level', 'N/A').title()}")
+        if insights.get('scan_quality'):
+            st.caption(f"Scan quality: {insights['scan_quality']['grade']}")
+        if insights.get('model_version'):
+            st.caption(f"Model: {insights['model_version']}")
 
 def reports_page():
     """Reports and analytics"""
     st.header("📊 Reports & Analytics")
     
-    patients = get_patients_from_db()
+    # Aggregate dalam SQL - tidak perlu tarik semua rows
+    try:
+        stats = patient_stats(patient_scope())
+    except Exception as e:
+        st.error(f"Error loading patients: {e}")
+        stats = {'total': 0}
     
-    if patients:
+    if stats['total']:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Patients", len(patients))
+            st.metric("Total Patients", stats['total'])
         
         with col2:
-            male_count = sum(1 for p in patients if p[4] == "Male")
-            female_count = sum(1 for p in patients if p[4] == "Female")
-            st.metric("Gender Distribution", f"♂{male_count} ♀{female_count}")
+            st.metric("Gender Distribution", f"♂{stats['male']} ♀{stats['female']}")
         
         with col3:
-            avg_age = sum(p[3] for p in patients) / len(patients)
+            avg_age = stats['average_age'] or 0.0
             st.metric("Average Age", f"{avg_age:.1f}")
         
         # Patient list
         st.subheader("Patient Details")
-        for patient in patients:
+        for patient in paged_patients("reports"):
             with st.expander(f"👤 {patient[2]} - {patient[1]}"):
                 st.write(f"**Age:** {patient[3]} | **Gender:** {patient[4]}")
-                st.write(f"**Contact:** {patient[5]}")
-                st.write(f"**Medical History:** {patient[6]}")
-                st.write(f"**Registered:** {patient[7].strftime('%Y-%m-%d')}")
+                st.write(f"**Registered:** {patient[5].strftime('%Y-%m-%d')}")
+                patient_details_section(patient, "reports")
     else:
         st.info("No patient data available for reports")
 
@@ -685,30 +976,31 @@ def view_sample_data():
     """View sample patient data"""
     st.header("📋 Sample Data Management")
     
-    patients = get_patients_from_db()
+    try:
+        stats = patient_stats(patient_scope())
+    except Exception as e:
+        st.error(f"Error loading patients: {e}")
+        stats = {'total': 0}
     
-    if patients:
-        st.success(f"📊 Found {len(patients)} patients in database")
-        
-        # Filter sample patients
-        sample_patients = [p for p in patients if p[1].startswith('SMP')]
-        regular_patients = [p for p in patients if not p[1].startswith('SMP')]
+    if stats['total']:
+        st.success(f"📊 Found {stats['total']} patients in database")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Sample Patients", len(sample_patients))
+            st.metric("Sample Patients", stats['sample'])
         
         with col2:
-            st.metric("Regular Patients", len(regular_patients))
+            st.metric("Regular Patients", stats['total'] - stats['sample'])
         
-        if sample_patients:
+        if stats['sample']:
             st.subheader("Sample Patients")
-            for patient in sample_patients:
+            # Filter SMP% dalam SQL
+            for patient in paged_patients("samples", code_prefix="SMP"):
                 with st.expander(f"👤 {patient[2]} - {patient[1]}"):
                     st.write(f"**Age:** {patient[3]} | **Gender:** {patient[4]}")
-                    st.write(f"**Contact:** {patient[5]}")
-                    st.write(f"**Registered:** {patient[7].strftime('%Y-%m-%d')}")
+                    st.write(f"**Registered:** {patient[5].strftime('%Y-%m-%d')}")
+                    patient_details_section(patient, "samples", history=False)
     else:
         st.info("No patients found in database")
 
@@ -726,6 +1018,12 @@ def main():
     if not st.session_state.authenticated:
         login_page()
     else:
+        # Model load & warmup sekali per process, dalam background selepas login
+        preload_analysis_engine()
+        
+        if get_setting("analysis.jobs.enabled", True) and get_setting("analysis.jobs.embedded_worker", True):
+            start_embedded_worker()
+        
         # Sidebar navigation
         st.sidebar.title("🩺 Pinnalogy AI")
         st.sidebar.write(f"Welcome, {st.session_state.user_name}")
@@ -0,0 +1,166 @@
+"""Headless batch analysis untuk folder scans dari partner clinics
+
+Contoh:
+    python batch_analyze.py scans/klinik_kl results/klinik_kl.csv --workers 4
+
+Output CSV guna columns sama seperti data/ear_segmentation_history.csv dan
+ditulis row demi row. Jika run terhenti, jalankan semula command yang sama -
+images yang sudah ada dalam CSV akan di-skip.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from modules.coverage import COVERAGE_COLUMNS
+
+HISTORY_COLUMNS = [
+    "image_id", "patient_id", "age", "gender", "image_size", "image_format",
+    *COVERAGE_COLUMNS,
+    "ear_condition", "scan_quality", "timestamp"
+]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# ===== WORKER PROCESS =====
+def init_worker(threads):
+    """Pin thread count & load satu model per worker process"""
+    from utils.helpers import set_setting
+    from modules.ear_analysis import get_engine
+
+    # Engine baca thread count dari setting semasa dibina
+    set_setting("analysis.runtime.intra_op_threads", threads)
+    set_setting("analysis.runtime.inter_op_threads", 1)
+
+    # Satu image pada satu masa dalam worker - tiada gunanya tunggu batching window
+    set_setting("analysis.batching.enabled", False)
+    # Satu run = satu model version; jangan hot reload di tengah batch
+    set_setting("analysis.models.watch_interval", 0)
+    get_engine()
+
+
+def analyze_file(path, image_id):
+    """Analyze satu image -> row CSV"""
+    from PIL import Image
+    from modules.coverage import compute_region_coverage
+    from modules.ear_analysis import load_upload, segment_ear
+    from modules.quality import assess_quality
+    from utils.helpers import get_setting
+
+    with Image.open(path) as probe:
+        width, height = probe.size
+        image_format = probe.format
+
+    image, tiled = load_upload(path)
+    quality = assess_quality(image)
+
+    row = {column: "" for column in HISTORY_COLUMNS}
+    # Scan Poor: rekod grade sahaja, skip inference
+    if quality['usable'] or not get_setting("analysis.quality.enabled", True):
+        row.update(compute_region_coverage(segment_ear(image, tiled=tiled)))
+    row.update({
+        "scan_quality": quality['grade'],
+        "image_id": image_id,
+        "image_size": f"{width}x{height}",
+        "image_format": image_format,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    })
+    return row
+
+
+# ===== RESUME SUPPORT =====
+def load_completed(output_path):
+    """Baca image_id yang sudah siap; buang row terakhir yang separuh ditulis (crash)"""
+    if not os.path.exists(output_path):
+        return set()
+
+    with open(output_path, newline="") as f:
+        lines = f.readlines()
+    if not lines:
+        return set()
+
+    completed = set()
+    valid_lines = lines[:1]
+    for line in lines[1:]:
+        if not line.endswith("\n"):
+            break
+        values = next(csv.reader([line]))
+        if len(values) != len(HISTORY_COLUMNS):
+            break
+        completed.add(values[0])
+        valid_lines.append(line)
+
+    if len(valid_lines) != len(lines):
+        with open(output_path, "w", newline="") as f:
+            f.writelines(valid_lines)
+    return completed
+
+
+def find_images(input_dir):
+    """Semua images dalam directory (recursive) -> list (path, image_id)"""
+    images = []
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(root, name)
+                images.append((path, os.path.relpath(path, input_dir).replace(os.sep, "/")))
+    return sorted(images, key=lambda item: item[1])
+
+
+# ===== MAIN =====
+def main():
+    cpu_count = os.cpu_count() or 1
+
+    parser = argparse.ArgumentParser(description="Batch ear segmentation analysis untuk satu directory images")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_csv")
+    parser.add_argument("--workers", type=int, default=max(1, cpu_count // 2))
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="TensorFlow intra-op threads setiap worker (default: cores / workers)")
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or max(1, cpu_count // args.workers)
+
+    completed = load_completed(args.output_csv)
+    pending = [(path, image_id) for path, image_id in find_images(args.input_dir) if image_id not in completed]
+    print(f"{len(completed)} already done, {len(pending)} to analyze "
+          f"({args.workers} workers x {threads} threads)")
+    if not pending:
+        return 0
+
+    write_header = not os.path.exists(args.output_csv) or os.path.getsize(args.output_csv) == 0
+    failures = 0
+    start = time.time()
+
+    # spawn: setiap worker mula bersih, tiada state TensorFlow yang di-fork
+    context = multiprocessing.get_context("spawn")
+    with open(args.output_csv, "a", newline="") as f, \
+            ProcessPoolExecutor(args.workers, mp_context=context, initializer=init_worker, initargs=(threads,)) as pool:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS)
+        if write_header:
+            writer.writeheader()
+            f.flush()
+
+        futures = {pool.submit(analyze_file, path, image_id): image_id for path, image_id in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            image_id = futures[future]
+            try:
+                writer.writerow(future.result())
+                f.flush()
+            except Exception as e:
+                failures += 1
+                print(f"Failed {image_id}: {e}", file=sys.stderr)
+            if done % 10 == 0 or done == len(futures):
+                rate = done / (time.time() - start)
+                print(f"{done}/{len(futures)} images ({rate:.1f} img/s)")
+
+    print(f"Done: {len(pending) - failures} analyzed, {failures} failed -> {args.output_csv}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""Benchmark inference pipeline dengan synthetic ear images
+
+Contoh:
+    python benchmark.py --output benchmarks/v2.3.json
+    python benchmark.py --iterations 30 --batch-sizes 1 4 8 16
+
+Pipeline sama seperti app: decode -> preprocess -> model -> coverage.
+Setiap stage diukur berasingan (p50/p95/p99 latency dan peak RSS), kemudian
+throughput end-to-end (images/s) untuk setiap batch size. Images full-HD
+di-decode terus ke 512x512 (path non-tiled) supaya semua batch sizes boleh
+dibandingkan. Result ditulis sebagai JSON untuk banding antara releases.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_SIZES = {"512x512": (512, 512), "1920x1080": (1920, 1080)}
+
+
+# ===== SYNTHETIC IMAGES =====
+def synthetic_ear_image(width, height, seed=0):
+    """Image JPEG menyerupai telinga: helix rim, antihelix, concha & lobule atas latar kulit"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    skin = np.array([150, 180, 220], dtype=np.float32) * rng.uniform(0.8, 1.1)
+    gradient = np.linspace(0.85, 1.05, height, dtype=np.float32)[:, np.newaxis, np.newaxis]
+    image = np.clip(np.ones((height, width, 3), dtype=np.float32) * skin * gradient, 0, 255).astype(np.uint8)
+
+    cx = int(width * rng.uniform(0.45, 0.55))
+    cy = int(height * rng.uniform(0.45, 0.55))
+    scale = min(width, height) / 2.6
+    rx, ry = int(scale * 0.62), int(scale)
+    angle = float(rng.uniform(-12, 12))
+
+    def shade(factor):
+        return tuple(int(c) for c in np.clip(skin * factor, 0, 255))
+
+    # Lobule, ear body, helix rim, antihelix ridge, concha bowl
+    cv2.ellipse(image, (cx, cy + int(ry * 0.75)), (int(rx * 0.55), int(ry * 0.35)), angle, 0, 360, shade(1.05), -1)
+    cv2.ellipse(image, (cx, cy), (rx, ry), angle, 0, 360, shade(1.0), -1)
+    cv2.ellipse(image, (cx, cy), (rx, ry), angle, 200, 520, shade(0.7), max(2, int(scale * 0.08)))
+    cv2.ellipse(image, (cx, cy), (int(rx * 0.7), int(ry * 0.7)), angle, 180, 430, shade(0.8), max(2, int(scale * 0.05)))
+    cv2.ellipse(image, (cx + int(rx * 0.1), cy + int(ry * 0.1)), (int(rx * 0.38), int(ry * 0.32)), angle, 0, 360, shade(0.55), -1)
+
+    noise = rng.normal(0, 6, image.shape)
+    image = np.clip(image + noise, 0, 255).astype(np.uint8)
+    image = cv2.GaussianBlur(image, (0, 0), max(1.0, scale / 150))
+
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("JPEG encode failed")
+    return encoded.tobytes()
+
+
+# ===== MEASUREMENT =====
+def _rss_reader():
+    """Function baca RSS semasa (bytes) - psutil jika ada, kalau tidak /proc (Linux)"""
+    try:
+        import psutil
+        process = psutil.Process()
+        return lambda: process.memory_info().rss
+    except ImportError:
+        pass
+    if os.path.exists("/proc/self/statm"):
+        page_size = os.sysconf("SC_PAGE_SIZE")
+
+        def read_statm():
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * page_size
+        return read_statm
+    return None
+
+
+class PeakRSS:
+    """Context manager - sample RSS dalam background thread, simpan peak sepanjang block"""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.read = _rss_reader()
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.read())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.read is not None:
+            self.start_bytes = self.peak_bytes = self.read()
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_bytes = max(self.peak_bytes, self.read())
+        return False
+
+    def report(self):
+        if self.read is None:
+            return {'peak_rss_mb': None, 'rss_increase_mb': None}
+        return {
+            'peak_rss_mb': round(self.peak_bytes / 2 ** 20, 1),
+            'rss_increase_mb': round((self.peak_bytes - self.start_bytes) / 2 ** 20, 1)
+        }
+
+
+def latency_stats(seconds):
+    """List masa (s) -> p50/p95/p99/mean dalam ms"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'mean_ms': round(float(ms.mean()), 2),
+        'samples': int(ms.size)
+    }
+
+
+def timed(fn, inputs):
+    """Run fn untuk setiap input -> (outputs, list masa)"""
+    outputs, times = [], []
+    for item in inputs:
+        start = time.perf_counter()
+        outputs.append(fn(item))
+        times.append(time.perf_counter() - start)
+    return outputs, times
+
+
+# ===== PIPELINE STAGES =====
+def decode(image_bytes):
+    from modules.ear_analysis import MODEL_INPUT_SIZE
+    from modules.preprocessing import decode_image
+    return decode_image(io.BytesIO(image_bytes), (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+
+
+def preprocess(image):
+    from modules.ear_analysis import prepare_input
+    return prepare_input(image)
+
+
+def benchmark_stages(engine, images):
+    """Latency & peak RSS setiap stage, satu image pada satu masa"""
+    from modules.coverage import compute_coverage_batch
+
+    results = {}
+    with PeakRSS() as rss:
+        decoded, times = timed(decode, images)
+    results['decode'] = {**latency_stats(times), **rss.report()}
+
+    with PeakRSS() as rss:
+        inputs, times = timed(preprocess, decoded)
+    results['preprocess'] = {**latency_stats(times), **rss.report()}
+
+    with PeakRSS() as rss:
+        probs, times = timed(lambda x: engine.predict_batch(x[np.newaxis]), inputs)
+    results['model'] = {**latency_stats(times), **rss.report()}
+
+    with PeakRSS() as rss:
+        _, times = timed(compute_coverage_batch, probs)
+    results['coverage'] = {**latency_stats(times), **rss.report()}
+    return results
+
+
+def run_pipeline(engine, batch_bytes):
+    """End-to-end untuk satu batch: decode -> preprocess -> model -> coverage"""
+    from modules.coverage import compute_coverage_batch
+    batch = np.stack([preprocess(decode(image_bytes)) for image_bytes in batch_bytes])
+    return compute_coverage_batch(engine.predict_batch(batch))
+
+
+def benchmark_throughput(engine, images, batch_sizes, iterations):
+    """Images/s dan latency per batch untuk setiap batch size"""
+    results = {}
+    for batch_size in batch_sizes:
+        batches = [
+            [images[(i * batch_size + j) % len(images)] for j in range(batch_size)]
+            for i in range(iterations)
+        ]
+        # Satu batch warmup - bentuk input baru
+        run_pipeline(engine, batches[0])
+
+        with PeakRSS() as rss:
+            start = time.perf_counter()
+            _, times = timed(lambda batch: run_pipeline(engine, batch), batches)
+            elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {
+            'images_per_second': round(batch_size * iterations / elapsed, 2),
+            'batch_latency': latency_stats(times),
+            **rss.report()
+        }
+        print(f"  batch {batch_size:>2}: {results[str(batch_size)]['images_per_second']:.2f} img/s")
+    return results
+
+
+# ===== MAIN =====
+def environment_info(engine):
+    """Metadata supaya result dari release berbeza boleh dibandingkan"""
+    from utils.helpers import get_setting
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    info = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'git_commit': commit,
+        'model_version': engine.model_version,
+        'backend': get_setting("analysis.backend", "keras"),
+        'runtime': get_setting("analysis.runtime", {}),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+    if "tensorflow" in sys.modules:
+        info['tensorflow'] = sys.modules["tensorflow"].__version__
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ear analysis pipeline dengan synthetic images")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--sizes", nargs="+", choices=list(IMAGE_SIZES), default=list(IMAGE_SIZES))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--iterations", type=int, default=20, help="Images per stage / batches per batch size")
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+
+    from modules.ear_analysis import get_engine
+
+    engine = get_engine()
+    report = {'environment': environment_info(engine), 'iterations': args.iterations, 'results': {}}
+
+    for name in args.sizes:
+        width, height = IMAGE_SIZES[name]
+        images = [synthetic_ear_image(width, height, seed) for seed in range(args.iterations)]
+        print(f"{name}: {len(images)} synthetic images ({np.mean([len(b) for b in images]) / 1024:.0f} KB avg)")
+
+        for image_bytes in images[:args.warmup]:
+            run_pipeline(engine, [image_bytes])
+
+        stages = benchmark_stages(engine, images)
+        for stage, stats in stages.items():
+            print(f"  {stage:<11} p50 {stats['p50_ms']:>8.2f} ms  p95 {stats['p95_ms']:>8.2f} ms  "
+                  f"p99 {stats['p99_ms']:>8.2f} ms  peak RSS {stats['peak_rss_mb']} MB")
+
+        report['results'][name] = {
+            'stages': stages,
+            'throughput': benchmark_throughput(engine, images, args.batch_sizes, args.iterations)
+        }
+
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"Results -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
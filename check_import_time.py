@@ -0,0 +1,120 @@
+"""Import-time check untuk app.py (cold start login page)
+
+Contoh:
+    python check_import_time.py            # report + semak regression
+    python check_import_time.py --update   # rekod baseline baru
+
+Guna `python -X importtime -c "import app"` dalam process baru. Gagal jika
+library berat (TensorFlow, OpenCV, numpy, pandas, PIL) di-import semasa
+module load, atau nisbah masa app / `import streamlit` (diukur dalam run
+yang sama, jadi tidak bergantung pada kelajuan mesin) melebihi baseline x
+tolerance. Baseline disimpan dalam data/import_time_baseline.json.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "data", "import_time_baseline.json")
+
+# Mesti di-import lazily - hanya bila Ear Analysis / Reports perlukan.
+# Nama module penuh: streamlit sendiri import PIL._version (kecil), bukan PIL.Image
+LAZY_MODULES = ("tensorflow", "keras", "cv2", "numpy", "pandas", "PIL.Image")
+
+# Rujukan untuk nisbah - app tidak boleh lebih cepat dari streamlit sendiri
+REFERENCE_MODULE = "streamlit"
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def measure_imports(module="app"):
+    """Run -X importtime dalam process baru -> list (name, self_us, cumulative_us, depth)"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return entries
+
+
+def summarize(entries, module="app"):
+    """Jumlah masa, top-level imports paling lambat, dan lazy modules yang ter-load"""
+    total_us = next(cumulative for name, _, cumulative, depth in entries if name == module and depth == 0)
+    top_level = sorted(
+        ((name, cumulative) for name, _, cumulative, depth in entries if depth == 1),
+        key=lambda item: item[1], reverse=True
+    )
+    loaded = sorted({name for name, *_ in entries} & set(LAZY_MODULES))
+    return {'total_ms': total_us / 1000, 'top_level': top_level, 'eager_heavy_modules': loaded}
+
+
+def best_summary(module, repeat):
+    """Summary run paling cepat dari beberapa run - kurangkan noise cold start"""
+    runs = [summarize(measure_imports(module), module) for _ in range(max(1, repeat))]
+    return min(runs, key=lambda summary: summary['total_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semak import time app.py")
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1.5,
+                        help="Gagal jika nisbah app/streamlit > baseline x tolerance")
+    parser.add_argument("--repeat", type=int, default=3, help="Ambil run paling cepat")
+    parser.add_argument("--update", action="store_true", help="Tulis baseline baru")
+    args = parser.parse_args()
+
+    summary = best_summary(args.module, args.repeat)
+    reference_ms = best_summary(REFERENCE_MODULE, args.repeat)['total_ms']
+    ratio = summary['total_ms'] / reference_ms
+    print(f"import {args.module}: {summary['total_ms']:.0f} ms "
+          f"({ratio:.2f}x import {REFERENCE_MODULE}: {reference_ms:.0f} ms)")
+    for name, cumulative in summary['top_level'][:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if summary['eager_heavy_modules']:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(summary['eager_heavy_modules'])}")
+        failed = True
+
+    if args.update:
+        baseline = {
+            'module': args.module,
+            'total_ms': round(summary['total_ms'], 1),
+            'reference_module': REFERENCE_MODULE,
+            'reference_ms': round(reference_ms, 1),
+            'ratio': round(ratio, 3),
+            'top_level_ms': {name: round(cumulative / 1000, 1) for name, cumulative in summary['top_level'][:args.top]}
+        }
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written -> {BASELINE_PATH}")
+    elif os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        if 'ratio' not in baseline:
+            print("baseline has no ratio - run with --update")
+        else:
+            limit = baseline['ratio'] * args.tolerance
+            print(f"baseline: {baseline['ratio']:.2f}x (limit {limit:.2f}x)")
+            if ratio > limit:
+                print("FAIL: import time regression")
+                failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
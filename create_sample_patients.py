@@ -7,9 +7,9 @@ import cv2
 import time
 import hashlib
 import json
-import os
-import psycopg2
 from dotenv import load_dotenv
+from database.connection import connection
+from database.models import migrate
 import bcrypt
 import random
 from datetime import timedelta
@@ -41,62 +41,25 @@ def verify_password(password, hashed_password):
 def init_database():
     """Initialize database tables"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        # Create users table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                name VARCHAR(100) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role VARCHAR(20) DEFAULT 'practitioner',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create patients table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS patients (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER,
-                patient_code VARCHAR(50) UNIQUE NOT NULL,
-                full_name VARCHAR(100) NOT NULL,
-                age INTEGER,
-                gender VARCHAR(10),
-                contact_info TEXT,
-                medical_history TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create ear_analyses table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS ear_analyses (
-                id SERIAL PRIMARY KEY,
-                patient_id INTEGER,
-                analysis_data JSONB,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Check jika admin user sudah wujud
-        cur.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'")
-        admin_exists = cur.fetchone()[0]
-        
-        # Jika admin belum wujud, create admin user
-        if admin_exists == 0:
-            hashed_password = hash_password('admin123')
-            cur.execute("""
-                INSERT INTO users (username, email, name, password_hash, role) 
-                VALUES (%s, %s, %s, %s, %s)
-            """, ('admin', 'admin@pinnalogy.com', 'Admin User', hashed_password, 'admin'))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            # Tables & indexes dari migrations bernombor (database/models.py)
+            migrate(conn)
+            cur = conn.cursor()
+        
+            # Check jika admin user sudah wujud
+            cur.execute("SELECT COUNT(*) FROM users WHERE username = 'admin'")
+            admin_exists = cur.fetchone()[0]
+        
+            # Jika admin belum wujud, create admin user
+            if admin_exists == 0:
+                hashed_password = hash_password('admin123')
+                cur.execute("""
+                    INSERT INTO users (username, email, name, password_hash, role) 
+                    VALUES (%s, %s, %s, %s, %s)
+                """, ('admin', 'admin@pinnalogy.com', 'Admin User', hashed_password, 'admin'))
+        
+            conn.commit()
+            cur.close()
         return True
         
     except Exception as e:
@@ -106,28 +69,27 @@ def init_database():
 def test_database_connection():
     """Test database connection"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        st.success("✅ PostgreSQL Connection SUCCESSFUL!")
-        
-        # Initialize database tables & admin user
-        if init_database():
-            st.success("✅ Database tables & admin user created!")
-        
-        cur = conn.cursor()
-        cur.execute("SELECT version();")
-        db_version = cur.fetchone()
-        st.write(f"Database Version: {db_version[0]}")
-        
-        # Show existing users
-        cur.execute("SELECT username, email, role FROM users")
-        users = cur.fetchall()
-        if users:
-            st.write("**Existing Users:**")
-            for user in users:
-                st.write(f"- {user[0]} ({user[1]}) - {user[2]}")
-        
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            st.success("✅ PostgreSQL Connection SUCCESSFUL!")
+        
+            # Initialize database tables & admin user
+            if init_database():
+                st.success("✅ Database tables & admin user created!")
+        
+            cur = conn.cursor()
+            cur.execute("SELECT version();")
+            db_version = cur.fetchone()
+            st.write(f"Database Version: {db_version[0]}")
+        
+            # Show existing users
+            cur.execute("SELECT username, email, role FROM users")
+            users = cur.fetchall()
+            if users:
+                st.write("**Existing Users:**")
+                for user in users:
+                    st.write(f"- {user[0]} ({user[1]}) - {user[2]}")
+        
+            cur.close()
         return True
         
     except Exception as e:
@@ -139,15 +101,14 @@ def test_database_connection():
 def authenticate_user(username, password):
     """Authenticate user with database"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT username, name, password_hash, role, id FROM users WHERE username = %s OR email = %s",
-            (username.lower(), username.lower())
-        )
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT username, name, password_hash, role, id FROM users WHERE username = %s OR email = %s",
+                (username.lower(), username.lower())
+            )
+            result = cur.fetchone()
+            cur.close()
         
         if result and verify_password(password, result[2]):
             return result[1], True, result[0], result[3], result[4]  # name, status, username, role, user_id
@@ -199,150 +160,149 @@ def create_sample_patients():
     
     try:
         # Connect to database
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        st.info("🔄 Creating sample patients...")
-        
-        # Sample data arrays
-        malay_names_male = [
-            "Ahmad bin Abdullah", "Muhammad bin Ismail", "Ali bin Hassan", 
-            "Salleh bin Mahmud", "Razak bin Omar", "Zulkifli bin Ahmad",
-            "Hafiz bin Mohd", "Faizal bin Yusof", "Amir bin Rahman",
-            "Syed bin Ibrahim", "Azman bin Sulaiman", "Kamarul bin Zaini"
-        ]
-        
-        malay_names_female = [
-            "Aishah binti Mohd", "Siti binti Hassan", "Nor binti Ahmad",
-            "Fatimah binti Omar", "Zainab binti Ismail", "Mariam binti Abdullah",
-            "Sarah binti Rahman", "Nurul binti Yusof", "Haslinda binti Sulaiman",
-            "Rosnah binti Ibrahim", "Zuraidah binti Mahmud", "Anisah binti Jamal"
-        ]
-        
-        chinese_names = [
-            "Tan Wei Ming", "Lim Chen Long", "Wong Mei Ling", "Lee Kok Wai",
-            "Chan Siew Lin", "Ng Poh Sim"
-        ]
-        
-        indian_names = [
-            "Raj Kumar", "Priya Devi", "Suresh Menon", "Lakshmi Ammal"
-        ]
-        
-        all_names = malay_names_male + malay_names_female + chinese_names + indian_names
-        
-        clinics = [
-            "Klinik Kesihatan Kuala Lumpur", "Hospital Umum Selangor", 
-            "Pusat Perubatan Ara Damansara", "Klinik Specialist Ear Care"
-        ]
-        
-        medical_conditions = [
-            "Hypertension", "Diabetes Type 2", "Asthma", "Migraine",
-            "Arthritis", "High Cholesterol", "Gastric", "Allergic Rhinitis"
-        ]
-        
-        # Ear analysis data templates
-        ear_analysis_templates = {
-            "normal": {
-                "detected_zones": ["earlobe", "helix_rim", "concha"],
-                "color_analysis": {"normal": "Healthy skin tone - 95% normal"},
-                "texture_analysis": {"smoothness": "Normal skin texture"},
-                "structural_features": ["Well-defined ear structure"],
-                "potential_concerns": [],
-                "recommended_checks": ["Routine annual checkup"],
-                "lifestyle_suggestions": ["Maintain current healthy lifestyle"],
-                "confidence_level": "high",
-                "ear_side": "left"
-            },
-            "mild_inflammation": {
-                "detected_zones": ["earlobe", "helix_rim", "tragus", "concha"],
-                "color_analysis": {
-                    "redness": "15% - Mild inflammation detected",
-                    "normal": "85% - Healthy areas"
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            st.info("🔄 Creating sample patients...")
+        
+            # Sample data arrays
+            malay_names_male = [
+                "Ahmad bin Abdullah", "Muhammad bin Ismail", "Ali bin Hassan", 
+                "Salleh bin Mahmud", "Razak bin Omar", "Zulkifli bin Ahmad",
+                "Hafiz bin Mohd", "Faizal bin Yusof", "Amir bin Rahman",
+                "Syed bin Ibrahim", "Azman bin Sulaiman", "Kamarul bin Zaini"
+            ]
+        
+            malay_names_female = [
+                "Aishah binti Mohd", "Siti binti Hassan", "Nor binti Ahmad",
+                "Fatimah binti Omar", "Zainab binti Ismail", "Mariam binti Abdullah",
+                "Sarah binti Rahman", "Nurul binti Yusof", "Haslinda binti Sulaiman",
+                "Rosnah binti Ibrahim", "Zuraidah binti Mahmud", "Anisah binti Jamal"
+            ]
+        
+            chinese_names = [
+                "Tan Wei Ming", "Lim Chen Long", "Wong Mei Ling", "Lee Kok Wai",
+                "Chan Siew Lin", "Ng Poh Sim"
+            ]
+        
+            indian_names = [
+                "Raj Kumar", "Priya Devi", "Suresh Menon", "Lakshmi Ammal"
+            ]
+        
+            all_names = malay_names_male + malay_names_female + chinese_names + indian_names
+        
+            clinics = [
+                "Klinik Kesihatan Kuala Lumpur", "Hospital Umum Selangor", 
+                "Pusat Perubatan Ara Damansara", "Klinik Specialist Ear Care"
+            ]
+        
+            medical_conditions = [
+                "Hypertension", "Diabetes Type 2", "Asthma", "Migraine",
+                "Arthritis", "High Cholesterol", "Gastric", "Allergic Rhinitis"
+            ]
+        
+            # Ear analysis data templates
+            ear_analysis_templates = {
+                "normal": {
+                    "detected_zones": ["earlobe", "helix_rim", "concha"],
+                    "color_analysis": {"normal": "Healthy skin tone - 95% normal"},
+                    "texture_analysis": {"smoothness": "Normal skin texture"},
+                    "structural_features": ["Well-defined ear structure"],
+                    "potential_concerns": [],
+                    "recommended_checks": ["Routine annual checkup"],
+                    "lifestyle_suggestions": ["Maintain current healthy lifestyle"],
+                    "confidence_level": "high",
+                    "ear_side": "left"
                 },
-                "texture_analysis": {"smoothness": "Slight irritation detected"},
-                "structural_features": ["Mild swelling in outer regions"],
-                "potential_concerns": ["Possible mild infection", "Allergic reaction"],
-                "recommended_checks": ["Inflammation markers", "Allergy test"],
-                "lifestyle_suggestions": ["Avoid potential allergens", "Keep ear dry"],
-                "confidence_level": "moderate",
-                "ear_side": "left"
+                "mild_inflammation": {
+                    "detected_zones": ["earlobe", "helix_rim", "tragus", "concha"],
+                    "color_analysis": {
+                        "redness": "15% - Mild inflammation detected",
+                        "normal": "85% - Healthy areas"
+                    },
+                    "texture_analysis": {"smoothness": "Slight irritation detected"},
+                    "structural_features": ["Mild swelling in outer regions"],
+                    "potential_concerns": ["Possible mild infection", "Allergic reaction"],
+                    "recommended_checks": ["Inflammation markers", "Allergy test"],
+                    "lifestyle_suggestions": ["Avoid potential allergens", "Keep ear dry"],
+                    "confidence_level": "moderate",
+                    "ear_side": "left"
+                }
             }
-        }
-        
-        # Clear existing sample data
-        cur.execute("DELETE FROM ear_analyses WHERE patient_id IN (SELECT id FROM patients WHERE patient_code LIKE 'SMP%')")
-        cur.execute("DELETE FROM patients WHERE patient_code LIKE 'SMP%'")
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Create 30 sample patients
-        for i in range(1, 31):
-            # Generate patient data
-            patient_code = f"SMP{i:03d}"
-            full_name = random.choice(all_names)
-            age = random.randint(18, 75)
-            gender = random.choice(["Male", "Female"])
+        
+            # Clear existing sample data
+            cur.execute("DELETE FROM ear_analyses WHERE patient_id IN (SELECT id FROM patients WHERE patient_code LIKE 'SMP%')")
+            cur.execute("DELETE FROM patients WHERE patient_code LIKE 'SMP%'")
+        
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+        
+            # Create 30 sample patients
+            for i in range(1, 31):
+                # Generate patient data
+                patient_code = f"SMP{i:03d}"
+                full_name = random.choice(all_names)
+                age = random.randint(18, 75)
+                gender = random.choice(["Male", "Female"])
             
-            phone = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
-            email = f"patient{patient_code.lower()}@example.com"
+                phone = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
+                email = f"patient{patient_code.lower()}@example.com"
             
-            blood_types = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
-            blood_type = random.choice(blood_types)
+                blood_types = ["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]
+                blood_type = random.choice(blood_types)
             
-            emergency_contact = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
+                emergency_contact = f"+601{random.randint(2,9)}{random.randint(1000000, 9999999):07d}"
             
-            # Medical history
-            conditions = random.sample(medical_conditions, random.randint(1, 3))
-            medications = ["Metformin 500mg", "Ventolin inhaler", "Amlodipine 5mg", "None"]
-            current_meds = random.sample(medications, random.randint(1, 2))
+                # Medical history
+                conditions = random.sample(medical_conditions, random.randint(1, 3))
+                medications = ["Metformin 500mg", "Ventolin inhaler", "Amlodipine 5mg", "None"]
+                current_meds = random.sample(medications, random.randint(1, 2))
             
-            medical_history = f"Conditions: {', '.join(conditions)}. Medications: {', '.join(current_meds)}."
-            notes = f"Registered at {random.choice(clinics)}. Regular checkup."
+                medical_history = f"Conditions: {', '.join(conditions)}. Medications: {', '.join(current_meds)}."
+                notes = f"Registered at {random.choice(clinics)}. Regular checkup."
             
-            # Insert patient
-            cur.execute("""
-                INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (st.session_state.user_id, patient_code, full_name, age, gender, 
-                  f"Phone: {phone}, Email: {email}, Emergency: {emergency_contact}, Blood Type: {blood_type}",
-                  medical_history + " " + notes))
+                # Insert patient
+                cur.execute("""
+                    INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (st.session_state.user_id, patient_code, full_name, age, gender, 
+                      f"Phone: {phone}, Email: {email}, Emergency: {emergency_contact}, Blood Type: {blood_type}",
+                      medical_history + " " + notes))
             
-            patient_id = cur.fetchone()[0]
+                patient_id = cur.fetchone()[0]
             
-            # Create ear analyses for this patient (both ears)
-            analysis_types = list(ear_analysis_templates.keys())
+                # Create ear analyses for this patient (both ears)
+                analysis_types = list(ear_analysis_templates.keys())
             
-            # Left ear analysis
-            left_analysis = ear_analysis_templates[random.choice(analysis_types)].copy()
-            left_analysis["ear_side"] = "left"
-            left_analysis["analysis_date"] = (datetime.now() - timedelta(days=random.randint(1, 90))).isoformat()
-            left_analysis["image_filename"] = f"left_ear_{patient_code}.jpg"
+                # Left ear analysis
+                left_analysis = ear_analysis_templates[random.choice(analysis_types)].copy()
+                left_analysis["ear_side"] = "left"
+                left_analysis["analysis_date"] = (datetime.now() - timedelta(days=random.randint(1, 90))).isoformat()
+                left_analysis["image_filename"] = f"left_ear_{patient_code}.jpg"
             
-            cur.execute("""
-                INSERT INTO ear_analyses (patient_id, analysis_data)
-                VALUES (%s, %s)
-            """, (patient_id, json.dumps(left_analysis)))
+                cur.execute("""
+                    INSERT INTO ear_analyses (patient_id, analysis_data)
+                    VALUES (%s, %s)
+                """, (patient_id, json.dumps(left_analysis)))
             
-            # Right ear analysis
-            right_analysis = ear_analysis_templates[random.choice(analysis_types)].copy()
-            right_analysis["ear_side"] = "right"
-            right_analysis["analysis_date"] = (datetime.now() - timedelta(days=random.randint(1, 90))).isoformat()
-            right_analysis["image_filename"] = f"right_ear_{patient_code}.jpg"
+                # Right ear analysis
+                right_analysis = ear_analysis_templates[random.choice(analysis_types)].copy()
+                right_analysis["ear_side"] = "right"
+                right_analysis["analysis_date"] = (datetime.now() - timedelta(days=random.randint(1, 90))).isoformat()
+                right_analysis["image_filename"] = f"right_ear_{patient_code}.jpg"
             
-            cur.execute("""
-                INSERT INTO ear_analyses (patient_id, analysis_data)
-                VALUES (%s, %s)
-            """, (patient_id, json.dumps(right_analysis)))
+                cur.execute("""
+                    INSERT INTO ear_analyses (patient_id, analysis_data)
+                    VALUES (%s, %s)
+                """, (patient_id, json.dumps(right_analysis)))
             
-            status_text.text(f"Creating patient {i}/30: {full_name}")
-            progress_bar.progress(i / 30)
+                status_text.text(f"Creating patient {i}/30: {full_name}")
+                progress_bar.progress(i / 30)
         
-        # Commit all changes
-        conn.commit()
-        cur.close()
-        conn.close()
+            # Commit all changes
+            conn.commit()
+            cur.close()
         
         st.success("🎉 Successfully created 30 sample patients!")
         time.sleep(2)
@@ -355,25 +315,24 @@ def create_sample_patients():
 def save_patient_to_db(patient_data):
     """Save patient to database"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        cur.execute("""
-            INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            st.session_state.user_id,
-            patient_data['patient_code'],
-            patient_data['full_name'],
-            patient_data['age'],
-            patient_data['gender'],
-            patient_data['contact_info'],
-            patient_data['medical_history']
-        ))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            cur.execute("""
+                INSERT INTO patients (user_id, patient_code, full_name, age, gender, contact_info, medical_history)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (
+                st.session_state.user_id,
+                patient_data['patient_code'],
+                patient_data['full_name'],
+                patient_data['age'],
+                patient_data['gender'],
+                patient_data['contact_info'],
+                patient_data['medical_history']
+            ))
+        
+            conn.commit()
+            cur.close()
         return True
         
     except Exception as e:
@@ -383,19 +342,18 @@ def save_patient_to_db(patient_data):
 def get_patients_from_db():
     """Get patients from database for current user"""
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT patient_code, full_name, age, gender, contact_info, medical_history, created_at 
-            FROM patients 
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-        """, (st.session_state.user_id,))
-        
-        patients = cur.fetchall()
-        cur.close()
-        conn.close()
+        with connection() as conn:
+            cur = conn.cursor()
+        
+            cur.execute("""
+                SELECT patient_code, full_name, age, gender, contact_info, medical_history, created_at 
+                FROM patients 
+                WHERE user_id = %s
+                ORDER BY created_at DESC
+            """, (st.session_state.user_id,))
+        
+            patients = cur.fetchall()
+            cur.close()
         return patients
         
     except Exception as e:
@@ -421,37 +379,36 @@ def analyze_ear_zones(img_array):
     except Exception as e:
         return ["general_ear_structure"]
 
-def analyze_ear_coloration(img_array):
-    """Analyze color patterns in ear for health indications"""
+def extract_ear_features(image):
+    """Per-region colour & texture features dari ear segmentation (modules.features)"""
     try:
-        color_options = {
-            "normal": "Healthy skin tone - normal",
-            "redness": "Mild inflammation detected", 
-            "pallor": "Reduced blood flow indicators"
-        }
-        return {random.choice(list(color_options.keys())): random.choice(list(color_options.values()))}
+        from modules.ear_analysis import segment_ear
+        from modules.features import extract_region_features
+        probs, pixels = segment_ear(image, return_input=True)
+        return extract_region_features(pixels, probs)
     except Exception as e:
-        return {"normal": "Color analysis completed"}
+        print(f"Feature extraction warning: {e}")
+        return {}
+
+def analyze_ear_coloration(region_features):
+    """Analyze color patterns in ear for health indications"""
+    from modules.features import summarize_color
+    return summarize_color(region_features)
 
-def analyze_ear_texture(img_array):
+def analyze_ear_texture(region_features):
     """Analyze skin texture for health clues"""
-    try:
-        texture_options = {
-            "smoothness": "Normal skin texture",
-            "roughness": "Mild texture irregularities"
-        }
-        return {random.choice(list(texture_options.keys())): random.choice(list(texture_options.values()))}
-    except Exception as e:
-        return {"smoothness": "Texture analysis completed"}
+    from modules.features import summarize_texture
+    return summarize_texture(region_features)
 
 def analyze_systemic_health_via_ear(image):
     """Analyze ear structure for systemic health indications"""
     img_array = np.array(image) if image else np.zeros((100, 100, 3))
+    region_features = extract_ear_features(image) if image else {}
     
     analysis = {
         'detected_zones': analyze_ear_zones(img_array),
-        'color_analysis': analyze_ear_coloration(img_array),
-        'texture_analysis': analyze_ear_texture(img_array),
+        'color_analysis': analyze_ear_coloration(region_features),
+        'texture_analysis': analyze_ear_texture(region_features),
         'structural_features': ["Well-defined structure", "Normal vascular patterns"]
     }
     
@@ -756,61 +713,60 @@ def view_sample_data():
     st.header("📋 Sample Patient Data")
     
     try:
-        conn = psycopg2.connect(os.getenv('DATABASE_URL'))
-        cur = conn.cursor()
-        
-        # Get sample patients
-        cur.execute("""
-            SELECT p.patient_code, p.full_name, p.age, p.gender, p.contact_info, 
-                   p.medical_history, p.created_at,
-                   COUNT(e.id) as analysis_count
-            FROM patients p 
-            LEFT JOIN ear_analyses e ON p.id = e.patient_id
-            WHERE p.patient_code LIKE 'SMP%'
-            GROUP BY p.id, p.patient_code, p.full_name, p.age, p.gender, 
-                     p.contact_info, p.medical_history, p.created_at
-            ORDER BY p.patient_code
-        """)
-        
-        patients = cur.fetchall()
+        with connection() as conn:
+            cur = conn.cursor()
         
-        if patients:
-            st.success(f"📊 Found {len(patients)} sample patients")
+            # Get sample patients
+            cur.execute("""
+                SELECT p.patient_code, p.full_name, p.age, p.gender, p.contact_info, 
+                       p.medical_history, p.created_at,
+                       COUNT(e.id) as analysis_count
+                FROM patients p 
+                LEFT JOIN ear_analyses e ON p.id = e.patient_id
+                WHERE p.patient_code LIKE 'SMP%'
+                GROUP BY p.id, p.patient_code, p.full_name, p.age, p.gender, 
+                         p.contact_info, p.medical_history, p.created_at
+                ORDER BY p.patient_code
+            """)
+        
+            patients = cur.fetchall()
+        
+            if patients:
+                st.success(f"📊 Found {len(patients)} sample patients")
             
-            # Display summary
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total Sample Patients", len(patients))
-            with col2:
-                total_analyses = sum(patient[7] for patient in patients)
-                st.metric("Total Ear Analyses", total_analyses)
-            with col3:
-                avg_age = sum(patient[2] for patient in patients) / len(patients)
-                st.metric("Average Age", f"{avg_age:.1f}")
+                # Display summary
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Total Sample Patients", len(patients))
+                with col2:
+                    total_analyses = sum(patient[7] for patient in patients)
+                    st.metric("Total Ear Analyses", total_analyses)
+                with col3:
+                    avg_age = sum(patient[2] for patient in patients) / len(patients)
+                    st.metric("Average Age", f"{avg_age:.1f}")
             
-            # Patient details
-            for patient in patients:
-                with st.expander(f"👤 {patient[1]} - {patient[0]} ({patient[2]} years, {patient[3]})"):
-                    col1, col2 = st.columns(2)
+                # Patient details
+                for patient in patients:
+                    with st.expander(f"👤 {patient[1]} - {patient[0]} ({patient[2]} years, {patient[3]})"):
+                        col1, col2 = st.columns(2)
                     
-                    with col1:
-                        st.write("**Personal Information:**")
-                        st.write(f"**Patient Code:** {patient[0]}")
-                        st.write(f"**Age:** {patient[2]}")
-                        st.write(f"**Gender:** {patient[3]}")
-                        st.write(f"**Registered:** {patient[6].strftime('%Y-%m-%d')}")
+                        with col1:
+                            st.write("**Personal Information:**")
+                            st.write(f"**Patient Code:** {patient[0]}")
+                            st.write(f"**Age:** {patient[2]}")
+                            st.write(f"**Gender:** {patient[3]}")
+                            st.write(f"**Registered:** {patient[6].strftime('%Y-%m-%d')}")
                     
-                    with col2:
-                        st.write("**Contact & Medical:**")
-                        st.write(f"**Contact:** {patient[4]}")
-                        st.write(f"**Medical History:** {patient[5]}")
-                        st.write(f"**Ear Analyses:** {patient[7]}")
+                        with col2:
+                            st.write("**Contact & Medical:**")
+                            st.write(f"**Contact:** {patient[4]}")
+                            st.write(f"**Medical History:** {patient[5]}")
+                            st.write(f"**Ear Analyses:** {patient[7]}")
         
-        else:
-            st.warning("No sample patients found. Please create sample data first.")
+            else:
+                st.warning("No sample patients found. Please create sample data first.")
         
-        cur.close()
-        conn.close()
+            cur.close()
         
     except Exception as e:
         st.error(f"Error loading sample data: {e}")
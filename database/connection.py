@@ -1 +1,238 @@
+"""Connection pool PostgreSQL untuk seluruh process
 
+Semua akses DB ambil connection melalui pool supaya satu rerun Streamlit
+tidak buat TCP + TLS + auth handshake berulang kali:
+
+    with connection() as conn:
+        cur = conn.cursor()
+        ...
+        conn.commit()
+
+Transaction yang tidak di-commit akan di-rollback bila connection
+dipulangkan. Saiz & timeout dari config.yaml (database.pool).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+from utils.helpers import get_setting
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Semua connection sedang digunakan dan tiada yang dipulangkan dalam checkout_timeout"""
+
+
+# ===== CONNECTION POOL =====
+class ConnectionPool:
+    """Pool thread-safe: max_size connections, idle dibuang selepas idle_timeout
+
+    Checkout semak connection yang lama idle (SELECT 1) sebelum diberi;
+    connection yang rosak dibuang dan diganti dengan yang baru.
+    """
+
+    def __init__(self, dsn, max_size=10, idle_timeout=300, health_check_after=30,
+                 checkout_timeout=30, connect_timeout=10):
+        self.dsn = dsn
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self.connect_timeout = connect_timeout
+        self.pid = os.getpid()
+
+        self._idle = []  # (conn, masa dipulangkan) - paling baru di hujung
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'expired': 0,
+            'health_check_failures': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connect_timeout=self.connect_timeout)
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_idle(self, now):
+        """Buang idle connections melebihi idle_timeout (dipanggil dengan lock)"""
+        if not self.idle_timeout:
+            return []
+        expired = [conn for conn, since in self._idle if now - since > self.idle_timeout]
+        if expired:
+            self._idle = [(conn, since) for conn, since in self._idle if now - since <= self.idle_timeout]
+            self._stats['expired'] += len(expired)
+        return expired
+
+    def _healthy(self, conn, idle_seconds):
+        if conn.closed:
+            return False
+        if idle_seconds < self.health_check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # ===== CHECKOUT / CHECKIN =====
+    def getconn(self):
+        """Checkout satu connection - block sehingga checkout_timeout jika pool penuh"""
+        deadline = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed")
+                expired = self._reap_idle(time.monotonic())
+                if self._idle:
+                    conn, since = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._in_use < self.max_size:
+                    conn, since = None, None
+                    self._in_use += 1
+                    break
+
+                if deadline is None:
+                    deadline = time.monotonic() + self.checkout_timeout
+                    self._stats['waits'] += 1
+                    wait_start = time.monotonic()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f"No database connection available after {self.checkout_timeout}s "
+                                      f"(max_size={self.max_size})")
+                self._cond.wait(remaining)
+            if deadline is not None:
+                self._stats['wait_seconds'] += time.monotonic() - wait_start
+            self._stats['checkouts'] += 1
+
+        for old in expired:
+            self._close_quietly(old)
+
+        try:
+            if conn is not None and not self._healthy(conn, time.monotonic() - since):
+                with self._cond:
+                    self._stats['health_check_failures'] += 1
+                    self._stats['discarded'] += 1
+                self._close_quietly(conn)
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Pulangkan connection; transaction terbuka di-rollback, connection rosak dibuang"""
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        discard = discard or bool(conn.closed)
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        """Context manager: checkout, yield connection, pulangkan walaupun ada exception"""
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            # Connection mungkin dalam transaction gagal - rollback, buang jika tidak boleh
+            self.putconn(conn, discard=bool(conn.closed))
+            raise
+        except BaseException:
+            self.putconn(conn, discard=True)
+            raise
+        else:
+            self.putconn(conn)
+
+    # ===== HOUSEKEEPING =====
+    def stats(self):
+        """Saiz pool & counters untuk sizing max_size"""
+        with self._cond:
+            return {
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'open': self._in_use + len(self._idle),
+                **self._stats,
+                'wait_seconds': round(self._stats['wait_seconds'], 3)
+            }
+
+    def close(self):
+        """Tutup idle connections; connection yang sedang digunakan ditutup bila dipulangkan"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+
+def get_pool():
+    """Get shared pool untuk process ini (pool baru selepas fork)"""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                # Selepas fork, socket milik parent - jangan close, cuma lupakan
+                _pool = ConnectionPool(
+                    os.getenv('DATABASE_URL'),
+                    max_size=get_setting("database.pool.max_size", 10),
+                    idle_timeout=get_setting("database.pool.idle_timeout", 300),
+                    health_check_after=get_setting("database.pool.health_check_after", 30),
+                    checkout_timeout=get_setting("database.pool.checkout_timeout", 30),
+                    connect_timeout=get_setting("database.pool.connect_timeout", 10)
+                )
+    return _pool
+
+
+def connection():
+    """with connection() as conn: - connection dari shared pool"""
+    return get_pool().connection()
+
+
+def pool_stats():
+    """Statistik shared pool (None jika belum dibuat)"""
+    return _pool.stats() if _pool is not None else None
@@ -1 +1,195 @@
+"""Schema PostgreSQL sebagai migrations bernombor
 
+Setiap migration = (version, nama, senarai SQL). Semua SQL idempotent
+(IF NOT EXISTS), jadi database lama yang dibuat ad hoc boleh terus di-migrate.
+Version yang sudah dijalankan direkod dalam schema_migrations; migration
+baru cuma ditambah di hujung MIGRATIONS - jangan ubah yang sudah dilepaskan.
+
+    python -c "from database.models import migrate; print(migrate())"
+"""
+import threading
+
+from database.connection import connection
+
+# Kunci pg_advisory_xact_lock - app, worker & batch tidak migrate serentak
+MIGRATION_LOCK_ID = 72_460_301
+
+_migrated = False
+_migrate_lock = threading.Lock()
+
+
+# ===== MIGRATIONS =====
+MIGRATIONS = (
+    (1, "core tables", (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            email VARCHAR(100) UNIQUE NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            role VARCHAR(20) DEFAULT 'practitioner',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS patients (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            patient_code VARCHAR(50) UNIQUE NOT NULL,
+            full_name VARCHAR(100) NOT NULL,
+            age INTEGER,
+            gender VARCHAR(10),
+            contact_info TEXT,
+            medical_history TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ear_analyses (
+            id SERIAL PRIMARY KEY,
+            patient_id INTEGER,
+            analysis_data JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS analysis_sessions (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            patient_id INTEGER REFERENCES patients(id),
+            session_code VARCHAR(50) UNIQUE NOT NULL,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )),
+    # Database lama dibuat sebelum patients ada user_id
+    (2, "patients.user_id", (
+        "ALTER TABLE patients ADD COLUMN IF NOT EXISTS user_id INTEGER",
+    )),
+    # Masks dalam BYTEA, bukan base64 dalam JSONB (modules/analysis_store.py)
+    (3, "ear_analyses storage columns", (
+        "ALTER TABLE ear_analyses ADD COLUMN IF NOT EXISTS mask_data BYTEA",
+        "ALTER TABLE ear_analyses ADD COLUMN IF NOT EXISTS model_version VARCHAR(100)",
+    )),
+    # Background analysis jobs (modules/job_queue.py)
+    (4, "analysis_jobs", (
+        """
+        CREATE TABLE IF NOT EXISTS analysis_jobs (
+            id SERIAL PRIMARY KEY,
+            patient_id INTEGER,
+            user_id INTEGER,
+            status VARCHAR(20) NOT NULL DEFAULT 'queued',
+            image_data BYTEA,
+            image_sha256 VARCHAR(64),
+            result JSONB,
+            error TEXT,
+            attempts INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+        """,
+        "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS tta BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS model_version VARCHAR(100)",
+        # Paired mode: image_data = telinga kiri, image_data_right = telinga kanan
+        "ALTER TABLE analysis_jobs ADD COLUMN IF NOT EXISTS image_data_right BYTEA",
+        # Image bytes dikosongkan bila job done/failed (complete_job/fail_job)
+        "ALTER TABLE analysis_jobs ALTER COLUMN image_data DROP NOT NULL",
+        # Partial index - worker hanya cari job yang masih queued
+        "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_queued ON analysis_jobs (id) WHERE status = 'queued'",
+    )),
+    # Index ikut query pages: patient list keyset (modules/patients.py:
+    # ORDER BY created_at DESC, id DESC), history per patient
+    (5, "query indexes", (
+        "CREATE INDEX IF NOT EXISTS idx_patients_created_id ON patients (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_patients_user_created_id ON patients (user_id, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_ear_analyses_patient_created ON ear_analyses (patient_id, created_at DESC)",
+        # jsonb_path_ops - lebih kecil dari jsonb_ops, cukup untuk query containment (@>)
+        "CREATE INDEX IF NOT EXISTS idx_ear_analyses_data ON ear_analyses USING GIN (analysis_data jsonb_path_ops)",
+        "ANALYZE patients",
+        "ANALYZE ear_analyses",
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ===== RUNNER =====
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def current_version(conn):
+    """Version schema dalam database (0 jika belum pernah migrate)"""
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        cur.close()
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+    version = cur.fetchone()[0]
+    cur.close()
+    return version
+
+
+def _migrate(conn, target):
+    applied = []
+    for version, name, statements in MIGRATIONS:
+        if version > target:
+            break
+        # Satu transaction setiap migration; lock dilepaskan bila commit
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            _ensure_version_table(cur)
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cur.fetchone() is None:
+                for sql in statements:
+                    cur.execute(sql)
+                cur.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+                applied.append(version)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return applied
+
+
+def migrate(conn=None, target=None):
+    """Jalankan migrations yang belum direkod -> senarai version yang baru dijalankan"""
+    target = LATEST_VERSION if target is None else target
+    if conn is not None:
+        applied = _migrate(conn, target)
+    else:
+        with connection() as conn:
+            applied = _migrate(conn, target)
+
+    if applied:
+        # Jawapan schema registry dari version lama - baca catalog semula
+        from database.schema import invalidate_schema
+        invalidate_schema()
+        print(f"Database migrated to version {applied[-1]} (applied {applied})")
+    return applied
+
+
+def ensure_schema():
+    """migrate() sekali setiap process - panggilan seterusnya tiada round trip"""
+    global _migrated
+    if _migrated:
+        return
+    with _migrate_lock:
+        if not _migrated:
+            with connection() as conn:
+                if current_version(conn) < LATEST_VERSION:
+                    migrate(conn)
+            _migrated = True
@@ -0,0 +1,81 @@
+"""Schema capabilities (table & column yang wujud) dari satu query catalog
+
+Jawapan disimpan dalam memory untuk seluruh process, jadi patient list /
+insert tidak perlu round trip ke information_schema setiap kali. Selepas
+DDL (ALTER/CREATE), panggil invalidate_schema() supaya query seterusnya
+membaca catalog semula.
+"""
+import threading
+
+from database.connection import connection
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+# ===== SCHEMA REGISTRY =====
+class SchemaRegistry:
+    """table -> frozenset columns untuk current_schema(), di-load sekali"""
+
+    def __init__(self):
+        self._tables = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _load(self, conn):
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = current_schema()
+        """)
+        tables = {}
+        for table, column in cur.fetchall():
+            tables.setdefault(table, set()).add(column)
+        cur.close()
+        return {table: frozenset(columns) for table, columns in tables.items()}
+
+    def tables(self, conn=None):
+        """Semua table -> columns; conn = connection yang sedang dipegang (elak checkout kedua)"""
+        tables = self._tables
+        if tables is not None:
+            return tables
+        with self._lock:
+            if self._tables is None:
+                if conn is not None:
+                    self._tables = self._load(conn)
+                else:
+                    with connection() as conn:
+                        self._tables = self._load(conn)
+                self.loads += 1
+            return self._tables
+
+    def has_table(self, table, conn=None):
+        return table in self.tables(conn)
+
+    def has_column(self, table, column, conn=None):
+        return column in self.tables(conn).get(table, ())
+
+    def invalidate(self):
+        """Buang jawapan cached - dipanggil selepas schema berubah"""
+        with self._lock:
+            self._tables = None
+
+
+def get_schema():
+    """Get shared schema registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = SchemaRegistry()
+    return _registry
+
+
+def has_column(table, column, conn=None):
+    """Column wujud? - dari memory selepas query catalog pertama"""
+    return get_schema().has_column(table, column, conn)
+
+
+def invalidate_schema():
+    get_schema().invalidate()
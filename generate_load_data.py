@@ -0,0 +1,287 @@
+"""Bulk synthetic patients + ear_analyses untuk load test, melalui COPY
+
+Contoh:
+    python generate_load_data.py --patients 100000
+    python generate_load_data.py --patients 1000000 --seed 7 --replace
+
+Taburan umur, jantina, ear_condition, coverage, confidence & scan quality
+diambil dari data/ear_segmentation_history.csv. Seed + argumen sama = data
+sama (tarikh relatif kepada --end-date, default hari ini). Rows distrim dalam
+chunks dengan COPY FROM STDIN; id patients ditempah dari sequence supaya
+analyses boleh dirujuk tanpa RETURNING untuk setiap row.
+
+Semua patient_code bermula dengan --prefix (default LOAD), jadi data load
+test mudah dibuang semula dengan --replace atau --delete.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_CSV = os.path.join(BASE_DIR, "data", "ear_segmentation_history.csv")
+
+FIRST_NAMES = {
+    "Male": ("Ahmad", "Mohammad", "Ali", "Razak", "Hafiz", "Azlan", "Faizal", "Imran", "Kamal", "Zulkifli",
+             "Lim Wei", "Tan Chee", "Raj", "Kumar", "Arjun", "Daniel"),
+    "Female": ("Siti", "Aishah", "Nor", "Zainab", "Fatimah", "Nurul", "Aminah", "Farah", "Hidayah", "Salmah",
+               "Lim Mei", "Tan Li", "Priya", "Devi", "Kavitha", "Sarah")
+}
+FATHER_NAMES = ("Abdullah", "Hassan", "Ismail", "Mohd", "Ahmad", "Omar", "Mahmud", "Sulaiman", "Rahman", "Yusof",
+                "Ibrahim", "Osman", "Hamid", "Salleh", "Aziz", "Yaacob")
+MEDICAL_CONDITIONS = ("Hypertension", "Diabetes Type 2", "Asthma", "Migraine", "Arthritis", "High Cholesterol",
+                      "Gastric", "Allergic Rhinitis")
+CLINICS = ("Klinik Kesihatan Kuala Lumpur", "Hospital Umum Selangor", "Pusat Perubatan Ara Damansara",
+           "Klinik Specialist Ear Care")
+
+# ear_condition (history CSV) -> bahagian statik analysis_data
+CONDITION_FINDINGS = {
+    "Normal": ([], ["Routine annual checkup"], "high"),
+    "Mild_Inflammation": (["Possible mild infection"], ["Inflammation markers"], "moderate"),
+    "Inflammation": (["Inflammation detected", "Allergic reaction"], ["Inflammation markers", "Allergy test"], "moderate"),
+    "Mild_Deformity": (["Mild structural irregularity"], ["ENT consultation"], "moderate"),
+    "Severe_Deformity": (["Significant structural deformity"], ["ENT consultation", "Imaging"], "low"),
+    "Scarring": (["Scar tissue present"], ["Dermatology review"], "moderate")
+}
+
+
+# ===== DISTRIBUTIONS =====
+def load_distributions(path=HISTORY_CSV):
+    """History CSV -> frequency & mean/std untuk setiap ear_condition"""
+    from modules.coverage import REGION_COVERAGE_COLUMNS
+
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    conditions = sorted({row['ear_condition'] for row in rows})
+    counts = np.array([sum(row['ear_condition'] == c for row in rows) for c in conditions], dtype=np.float64)
+    columns = REGION_COVERAGE_COLUMNS + ("analysis_confidence",)
+    values = np.array([[float(row[col]) for col in columns] for row in rows])
+    by_condition = np.array([[row['ear_condition'] == c for row in rows] for c in conditions])
+
+    quality = {}
+    for c in conditions:
+        grades = [row['scan_quality'] for row in rows if row['ear_condition'] == c]
+        quality[c] = max(set(grades), key=grades.count)
+
+    ages = np.array([float(row['age']) for row in rows])
+    return {
+        'conditions': conditions,
+        'condition_p': counts / counts.sum(),
+        'columns': columns,
+        'mean': np.array([values[mask].mean(axis=0) for mask in by_condition]),
+        # Sampel kecil setiap condition - guna std keseluruhan supaya taburan tidak terlalu sempit
+        'std': values.std(axis=0),
+        'quality': quality,
+        'age_mean': float(ages.mean()),
+        'age_std': max(float(ages.std()), 12.0),
+        'male_p': sum(row['gender'] == "Male" for row in rows) / len(rows)
+    }
+
+
+# ===== ROW GENERATION =====
+# Baris COPY format text (tab-separated). Nilai dibina sendiri tanpa tab/newline,
+# jadi cukup escape backslash sekali untuk seluruh chunk.
+def random_timestamps(rng, n, end, days):
+    """n timestamps (datetime64[s]) seragam dalam `days` hari sebelum end"""
+    return np.datetime64(end, "s") - rng.integers(0, days * 86400, n).astype("timedelta64[s]")
+
+
+def patient_lines(rng, first_id, first_index, n, args, dist, end):
+    """Baris COPY patients + created_at (untuk analyses)"""
+    male = rng.random(n) < dist['male_p']
+    ages = np.clip(rng.normal(dist['age_mean'], dist['age_std'], n), 18, 90).astype(int)
+    first = rng.integers(0, len(FIRST_NAMES["Male"]), n)
+    father = rng.integers(0, len(FATHER_NAMES), n)
+    phones = rng.integers(1_000_000, 9_999_999, n)
+    n_conditions = rng.integers(0, 4, n)
+    condition_idx = rng.integers(0, len(MEDICAL_CONDITIONS), (n, 3))
+    clinic = rng.integers(0, len(CLINICS), n)
+    created = random_timestamps(rng, n, end, args.days)
+    created_text = np.datetime_as_string(created, unit="s").tolist()
+    male, ages, first, father, phones = male.tolist(), ages.tolist(), first.tolist(), father.tolist(), phones.tolist()
+    n_conditions, condition_idx, clinic = n_conditions.tolist(), condition_idx.tolist(), clinic.tolist()
+
+    lines = []
+    for i in range(n):
+        gender = "Male" if male[i] else "Female"
+        code = f"{args.prefix}{first_index + i:07d}"
+        name = f"{FIRST_NAMES[gender][first[i]]} {'bin' if male[i] else 'binti'} {FATHER_NAMES[father[i]]}"
+        conditions = ", ".join(dict.fromkeys(MEDICAL_CONDITIONS[c] for c in condition_idx[i][:n_conditions[i]])) or "None"
+        lines.append(
+            f"{first_id + i}\t{args.user_id}\t{code}\t{name}\t{ages[i]}\t{gender}\t"
+            f"Phone: +601{2 + phones[i] % 8}{phones[i]:07d}, Email: {code.lower()}@example.com\t"
+            f"Conditions: {conditions}. Registered at {CLINICS[clinic[i]]}.\t{created_text[i]}\n"
+        )
+    return lines, created
+
+
+def analysis_lines(rng, first_id, n_patients, patient_created, per_patient, dist, end):
+    """Baris COPY ear_analyses - analysis_data sama bentuk dengan output analyze_ear"""
+    from modules.ear_analysis import EAR_REGIONS, REGION_TO_ZONE
+
+    n = n_patients * per_patient
+    condition = rng.choice(len(dist['conditions']), n, p=dist['condition_p'])
+    values = rng.normal(dist['mean'][condition], dist['std'])
+    regions = np.clip(values[:, :len(EAR_REGIONS)], 0.0, 100.0).round(1)
+    confidence = np.clip(values[:, -1], 0.3, 0.99)
+    total = regions.sum(axis=1)
+
+    # Analysis dibuat selepas patient didaftar, sebelum end
+    owner = np.repeat(np.arange(n_patients), per_patient)
+    start = patient_created[owner]
+    created = start + ((np.datetime64(end, "s") - start).astype(np.float64) * rng.random(n)).astype("timedelta64[s]")
+    created_text = np.datetime_as_string(created, unit="s")
+
+    # Zones ikut region yang dikesan (bitmask -> senarai JSON), bahagian statik di-encode sekali
+    detected = (regions > 5.0) @ (1 << np.arange(len(EAR_REGIONS)))
+    zones = [
+        ", ".join(f'"{REGION_TO_ZONE[region]}"' for k, region in enumerate(EAR_REGIONS) if mask >> k & 1)
+        for mask in range(1 << len(EAR_REGIONS))
+    ]
+    static = []
+    for c in dist['conditions']:
+        concerns, checks, level = CONDITION_FINDINGS.get(c, ([], ["Routine annual checkup"], "moderate"))
+        static.append(json.dumps({
+            'ear_condition': c,
+            'potential_concerns': concerns,
+            'recommended_checks': checks,
+            'confidence_level': level,
+            'scan_quality': {'grade': dist['quality'][c], 'usable': dist['quality'][c] != "Poor"},
+            'model_version': "synthetic"
+        })[1:-1])
+
+    coverage = ", ".join(f'"{region}_coverage": %.1f' for region in EAR_REGIONS)
+    template = (
+        f'%d\t{{"region_coverage": {{{coverage}, "total_coverage": %.1f, "analysis_confidence": %.2f}}, '
+        f'"detected_zones": [%s], "ear_side": "%s", "analysis_date": "%s", %s}}\tsynthetic\t%s\n'
+    )
+    sides = ("left", "right")
+    # tolist() dahulu - format Python float/int jauh lebih cepat dari numpy scalars
+    ids = (owner + first_id).tolist()
+    regions, total, confidence = regions.tolist(), total.tolist(), confidence.tolist()
+    detected, condition, created_text = detected.tolist(), condition.tolist(), created_text.tolist()
+    return [
+        template % (ids[j], *regions[j], total[j], confidence[j], zones[detected[j]],
+                    sides[j % 2], created_text[j], static[condition[j]], created_text[j])
+        for j in range(n)
+    ]
+
+
+# ===== DATABASE =====
+def copy_lines(cur, table, columns, lines):
+    """COPY FROM STDIN (text) - satu round trip untuk seluruh chunk"""
+    buffer = io.StringIO("".join(lines).replace("\\", "\\\\"))
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def reserve_patient_ids(cur, n):
+    """Tempah n id berturut dari sequence patients.id -> id pertama
+
+    Table di-lock sehingga commit supaya INSERT lain tidak ambil id di tengah.
+    """
+    cur.execute("LOCK TABLE patients IN SHARE ROW EXCLUSIVE MODE")
+    cur.execute("SELECT pg_get_serial_sequence('patients', 'id')")
+    sequence = cur.fetchone()[0]
+    cur.execute("SELECT nextval(%s)", (sequence,))
+    first_id = cur.fetchone()[0]
+    cur.execute("SELECT setval(%s, %s)", (sequence, first_id + n - 1))
+    return first_id
+
+
+def delete_prefix(conn, prefix):
+    """Buang patients (dan analyses) dengan patient_code bermula prefix -> bilangan patients"""
+    cur = conn.cursor()
+    pattern = f"{prefix}%"
+    cur.execute("""
+        DELETE FROM ear_analyses
+        WHERE patient_id IN (SELECT id FROM patients WHERE patient_code LIKE %s)
+    """, (pattern,))
+    cur.execute("DELETE FROM patients WHERE patient_code LIKE %s", (pattern,))
+    deleted = cur.rowcount
+    conn.commit()
+    cur.close()
+    return deleted
+
+
+def generate(conn, args, dist):
+    """Tulis --patients rows dalam chunks -> (patients, analyses)"""
+    end = datetime.combine(args.end_date, datetime.min.time())
+    cur = conn.cursor()
+    cur.execute("SELECT COUNT(*) FROM patients WHERE patient_code LIKE %s", (f"{args.prefix}%",))
+    first_index = cur.fetchone()[0] + 1
+
+    total_patients = total_analyses = 0
+    for start in range(0, args.patients, args.chunk_size):
+        n = min(args.chunk_size, args.patients - start)
+        # Seed ikut kedudukan chunk - hasil sama walaupun dijalankan semula
+        rng = np.random.default_rng([args.seed, first_index + start])
+
+        first_id = reserve_patient_ids(cur, n)
+        patients, created = patient_lines(rng, first_id, first_index + start, n, args, dist, end)
+        copy_lines(cur, "patients", ("id", "user_id", "patient_code", "full_name", "age", "gender",
+                                     "contact_info", "medical_history", "created_at"), patients)
+        if args.analyses_per_patient:
+            analyses = analysis_lines(rng, first_id, n, created, args.analyses_per_patient, dist, end)
+            copy_lines(cur, "ear_analyses", ("patient_id", "analysis_data", "model_version", "created_at"), analyses)
+            total_analyses += len(analyses)
+        conn.commit()
+
+        total_patients += n
+        print(f"  {total_patients:>9,} patients, {total_analyses:>9,} analyses")
+
+    cur.execute("ANALYZE patients")
+    cur.execute("ANALYZE ear_analyses")
+    conn.commit()
+    cur.close()
+    return total_patients, total_analyses
+
+
+# ===== MAIN =====
+def main():
+    parser = argparse.ArgumentParser(description="Bulk synthetic data (COPY) untuk load test Pinnalogy AI")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--analyses-per-patient", type=int, default=2, help="Berselang left/right ear")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--prefix", default="LOAD", help="Awalan patient_code untuk data load test")
+    parser.add_argument("--user-id", type=int, default=1, help="patients.user_id (practitioner)")
+    parser.add_argument("--days", type=int, default=365, help="Julat created_at sebelum --end-date")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date.today())
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--replace", action="store_true", help="Buang data --prefix sedia ada dahulu")
+    parser.add_argument("--delete", action="store_true", help="Buang data --prefix sahaja, tidak generate")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from database.connection import connection
+    from database.models import ensure_schema
+
+    ensure_schema()
+    with connection() as conn:
+        if args.replace or args.delete:
+            print(f"Deleted {delete_prefix(conn, args.prefix):,} existing {args.prefix}* patients")
+        if args.delete:
+            return 0
+
+        dist = load_distributions()
+        print(f"Generating {args.patients:,} patients (seed {args.seed}, prefix {args.prefix})")
+        start = time.perf_counter()
+        patients, analyses = generate(conn, args, dist)
+        elapsed = time.perf_counter() - start
+
+    rows = patients + analyses
+    print(f"Inserted {patients:,} patients + {analyses:,} analyses in {elapsed:.1f}s "
+          f"({rows / elapsed:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
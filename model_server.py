@@ -0,0 +1,44 @@
+"""Shared model server untuk semua Streamlit app processes
+
+Contoh:
+    python model_server.py --threads 8
+
+Satu process ini sahaja load TensorFlow & model; app processes (dengan
+analysis.server.enabled: true dalam config.yaml) hantar tensors melalui Unix
+socket + shared memory. Memory kekal rata bila app processes ditambah dan
+micro-batching merangkumi request dari semua process.
+"""
+import argparse
+import signal
+import threading
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pinnalogy AI shared model server")
+    parser.add_argument("--socket", default=None, help="Path Unix socket (default: analysis.server.socket)")
+    parser.add_argument("--threads", type=int, default=None, help="TensorFlow intra-op threads")
+    args = parser.parse_args()
+
+    from modules.ear_analysis import get_engine
+    from modules.model_server import serve
+    from utils.helpers import get_setting, set_setting
+
+    # Process ini yang pegang model - jangan sambung ke diri sendiri
+    set_setting("analysis.server.enabled", False)
+    if args.threads:
+        set_setting("analysis.runtime.intra_op_threads", args.threads)
+
+    socket_path = args.socket or get_setting("analysis.server.socket", "/tmp/pinnalogy-model.sock")
+    print(f"Loading model {get_engine().model_version}")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    print(f"Model server listening on {socket_path}")
+    serve(socket_path, stop_event)
+    print("Model server stopped")
+
+
+if __name__ == "__main__":
+    main()
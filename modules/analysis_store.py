@@ -0,0 +1,83 @@
+import base64
+import json
+
+import psycopg2
+
+from database.connection import connection
+from database.models import ensure_schema
+
+
+# ===== TABLE SETUP =====
+def init_analysis_storage():
+    """Pastikan ear_analyses ada column mask_data (BYTEA) & model_version - melalui migrations"""
+    ensure_schema()
+
+
+# ===== SAVE / LOAD =====
+def save_ear_analysis(conn, patient_id, analysis_results):
+    """Simpan analysis ke ear_analyses -> analysis id
+
+    mask_data (base64 dalam results) dipindah ke column BYTEA, jadi JSONB
+    hanya simpan findings & coverage.
+    """
+    analysis_data = dict(analysis_results)
+    mask_data = analysis_data.pop('mask_data', None)
+    mask_bytes = psycopg2.Binary(base64.b64decode(mask_data)) if mask_data else None
+
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO ear_analyses (patient_id, analysis_data, mask_data, model_version)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id
+    """, (patient_id, json.dumps(analysis_data, default=str), mask_bytes, analysis_data.get('model_version')))
+    analysis_id = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return analysis_id
+
+
+def save_ear_analysis_pair(conn, patient_id, pair):
+    """Simpan paired result sebagai dua rows (ear_side left/right) dengan asymmetry
+
+    analysis_id setiap side ditulis ke pair[side]; side yang ditolak quality gate tidak disimpan.
+    """
+    for side in ("left", "right"):
+        results = pair[side]
+        if results.get('rejected'):
+            continue
+        if pair.get('asymmetry'):
+            results = dict(results, asymmetry=pair['asymmetry'])
+        pair[side]['analysis_id'] = save_ear_analysis(conn, patient_id, results)
+    return pair
+
+
+def load_analysis_masks(analysis_id):
+    """Masks dari analysis lama -> (masks [H,W,4], model_version) atau None - tiada forward pass"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT mask_data FROM ear_analyses WHERE id = %s", (analysis_id,))
+        row = cur.fetchone()
+        cur.close()
+
+    if row is None or row[0] is None:
+        return None
+    from modules.mask_codec import decode_masks
+    # psycopg2 return memoryview - decode terus tanpa salinan
+    return decode_masks(row[0])
+
+
+def get_patient_analyses(patient_id, limit=10):
+    """Senarai analysis terkini untuk satu patient (tanpa mask_data)"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, created_at, analysis_data->'region_coverage', mask_data IS NOT NULL,
+                   COALESCE(model_version, analysis_data->>'model_version')
+            FROM ear_analyses
+            WHERE patient_id = %s
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (patient_id, limit))
+        rows = cur.fetchall()
+        cur.close()
+    return rows
@@ -0,0 +1,90 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+# ===== MICRO-BATCHING SCHEDULER =====
+class MicroBatchScheduler:
+    """Kumpul request serentak dan run satu forward pass [N,512,512,3]
+
+    Request pertama buka satu window (window_ms). Semua request yang masuk
+    dalam window tersebut, sehingga max_batch_size, digabung dalam satu batch.
+    """
+
+    def __init__(self, predict_fn, window_ms=15, max_batch_size=8):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        self.batches_run = 0
+        self.items_run = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ear-batch-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue satu input [512,512,3] - return Future untuk output sendiri"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def predict(self, item, timeout=None):
+        """Submit dan tunggu result"""
+        return self.submit(item).result(timeout=timeout)
+
+    def close(self):
+        """Stop scheduler thread selepas habiskan queue"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """Statistik batching untuk tuning window & batch size"""
+        return {
+            'batches_run': self.batches_run,
+            'items_run': self.items_run,
+            'avg_batch_size': self.items_run / self.batches_run if self.batches_run else 0.0
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._execute(batch)
+
+    def _execute(self, batch):
+        try:
+            inputs = np.stack([item for item, _ in batch])
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches_run += 1
+        self.items_run += len(batch)
+        for i, (_, future) in enumerate(batch):
+            future.set_result(outputs[i])
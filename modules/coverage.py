@@ -0,0 +1,88 @@
+import numpy as np
+
+from modules.ear_analysis import EAR_REGIONS, MASK_THRESHOLD
+
+# Column names ikut data/ear_segmentation_history.csv
+REGION_COVERAGE_COLUMNS = tuple(f"{region}_coverage" for region in EAR_REGIONS)
+COVERAGE_COLUMNS = REGION_COVERAGE_COLUMNS + ("total_coverage", "analysis_confidence")
+
+
+# ===== REGION COVERAGE =====
+def compute_coverage_batch(probs, threshold=MASK_THRESHOLD):
+    """Kira coverage & confidence untuk batch sigmoid maps [N,H,W,4] -> [N,6]
+
+    Setiap pixel diberi satu region sahaja (argmax antara 4 heads) jika
+    probability tertinggi >= threshold, jadi region tidak bertindih dan
+    total_coverage = jumlah coverage region. Luas dikira dengan satu
+    bincount untuk semua images; confidence = purata probability dalam mask.
+    """
+    probs = np.asarray(probs, dtype=np.float32)
+    if probs.ndim == 3:
+        probs = probs[np.newaxis]
+    n_images, height, width, n_regions = probs.shape
+    bins = n_regions + 1
+
+    labels = probs.argmax(axis=-1)
+    peak = np.take_along_axis(probs, labels[..., np.newaxis], axis=-1)[..., 0]
+
+    # Label 0 = background, 1..4 = region; offset setiap image supaya satu bincount cukup
+    labels += 1
+    labels[peak < threshold] = 0
+    labels += (np.arange(n_images) * bins)[:, np.newaxis, np.newaxis]
+
+    flat_labels = labels.ravel()
+    counts = np.bincount(flat_labels, minlength=n_images * bins).reshape(n_images, bins)
+    prob_sums = np.bincount(flat_labels, weights=peak.ravel(), minlength=n_images * bins).reshape(n_images, bins)
+
+    region_counts = counts[:, 1:]
+    foreground = region_counts.sum(axis=1)
+
+    result = np.empty((n_images, len(COVERAGE_COLUMNS)), dtype=np.float64)
+    result[:, :n_regions] = region_counts * (100.0 / (height * width))
+    result[:, n_regions] = result[:, :n_regions].sum(axis=1)
+    result[:, n_regions + 1] = np.divide(
+        prob_sums[:, 1:].sum(axis=1), foreground,
+        out=np.zeros(n_images), where=foreground > 0
+    )
+    return result
+
+
+def compute_region_coverage(probs, threshold=MASK_THRESHOLD):
+    """Coverage satu image [H,W,4] -> dict ikut columns ear_segmentation_history.csv"""
+    values = compute_coverage_batch(probs, threshold)[0]
+    return coverage_to_record(values)
+
+
+def compute_asymmetry(left, right):
+    """Coverage kiri & kanan (dict ikut COVERAGE_COLUMNS) -> asymmetry per region
+
+    asymmetry_index = |L - R| / purata(L, R) x 100 (%); 0 bila kedua-dua kosong.
+    """
+    columns = REGION_COVERAGE_COLUMNS + ("total_coverage",)
+    left_values = np.array([left[column] for column in columns], dtype=np.float64)
+    right_values = np.array([right[column] for column in columns], dtype=np.float64)
+
+    difference = left_values - right_values
+    mean = (left_values + right_values) / 2
+    index = np.divide(np.abs(difference) * 100, mean, out=np.zeros_like(mean), where=mean > 0)
+
+    regions = {}
+    for i, column in enumerate(columns):
+        regions[column.replace("_coverage", "")] = {
+            'left': round(float(left_values[i]), 1),
+            'right': round(float(right_values[i]), 1),
+            'difference': round(float(difference[i]), 1),
+            'asymmetry_index': round(float(index[i]), 1)
+        }
+    return {
+        'regions': regions,
+        # Purata atas 4 region sahaja (bukan total)
+        'mean_asymmetry_index': round(float(index[:len(REGION_COVERAGE_COLUMNS)].mean()), 1)
+    }
+
+
+def coverage_to_record(values):
+    """Row [6] -> dict, dibundarkan macam dalam CSV (coverage 1 d.p., confidence 2 d.p.)"""
+    record = {column: round(float(value), 1) for column, value in zip(COVERAGE_COLUMNS[:-1], values[:-1])}
+    record["analysis_confidence"] = round(float(values[-1]), 2)
+    return record
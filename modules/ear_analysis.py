@@ -1 +1,544 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from datetime import datetime
 
+import numpy as np
+
+from modules.preprocessing import decode_image, input_buffer, resize_to_input
+from utils.helpers import get_setting
+
+# ===== MODEL CONFIGURATION =====
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(BASE_DIR, "ear_segmentation_model.keras")
+MODEL_INPUT_SIZE = 512
+
+# Output heads ikut susunan dalam model (helix, antihelix, concha, lobule)
+EAR_REGIONS = ("helix", "antihelix", "concha", "lobule")
+
+# Region model -> zone dalam EAR_REFLEXOLOGY_MAP (app.py)
+REGION_TO_ZONE = {
+    "helix": "helix_rim",
+    "antihelix": "anti_helix",
+    "concha": "concha",
+    "lobule": "earlobe"
+}
+
+MASK_THRESHOLD = 0.5
+
+_registry = None
+_registry_lock = threading.Lock()
+
+_threading_configured = False
+_threading_lock = threading.Lock()
+
+
+# ===== INFERENCE ENGINE =====
+def model_file_version(path):
+    """Version string dari nama fail + sha256 kandungan, contoh ear_segmentation_model.keras@1a2b3c4d5e6f"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"{os.path.basename(path)}@{digest.hexdigest()[:12]}"
+
+
+def configure_threading(intra_op=None, inter_op=None):
+    """Set TensorFlow CPU thread pools dari config.yaml (analysis.runtime.*)
+
+    Mesti dipanggil sebelum TensorFlow mula run op pertama. 0/None = default
+    TensorFlow (semua cores) - set nilai kecil bila banyak worker berkongsi CPU.
+    """
+    if intra_op is None:
+        intra_op = get_setting("analysis.runtime.intra_op_threads", 0)
+    if inter_op is None:
+        inter_op = get_setting("analysis.runtime.inter_op_threads", 0)
+
+    if intra_op:
+        # oneDNN/OpenMP baca env ini semasa TensorFlow di-import
+        os.environ.setdefault("OMP_NUM_THREADS", str(intra_op))
+        os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(intra_op))
+    if inter_op:
+        os.environ.setdefault("TF_NUM_INTEROP_THREADS", str(inter_op))
+
+    import tensorflow as tf
+
+    try:
+        if intra_op:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op)
+        if inter_op:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op)
+    except RuntimeError as e:
+        # Runtime sudah initialized - thread pools tidak boleh diubah lagi
+        print(f"Threading config warning: {e}")
+    return intra_op, inter_op
+
+
+def ensure_threading_configured():
+    """configure_threading() sekali setiap process, sebelum engine pertama dibina
+
+    Selepas TensorFlow initialized, thread pools tidak boleh diubah - engine
+    yang di-load semula (hot reload registry) tidak cuba set lagi.
+    """
+    global _threading_configured
+    if _threading_configured:
+        return
+    with _threading_lock:
+        if not _threading_configured:
+            configure_threading()
+            _threading_configured = True
+
+
+class EarSegmentationEngine:
+    """Load ear_segmentation_model.keras sekali dan run forward pass
+
+    Forward pass dibungkus dalam tf.function dengan signature tetap
+    [None,512,512,3], jadi graph di-trace sekali sahaja untuk semua batch
+    size dan boleh di-compile dengan XLA (analysis.runtime.xla).
+    """
+
+    def __init__(self, model_path=MODEL_PATH, xla=None):
+        ensure_threading_configured()
+
+        # TensorFlow hanya di-import bila engine dibina
+        import tensorflow as tf
+        from tensorflow import keras
+
+        if xla is None:
+            xla = get_setting("analysis.runtime.xla", False)
+
+        self.model_path = model_path
+        self.model_version = model_file_version(model_path)
+        self.model = keras.models.load_model(model_path, compile=False)
+
+        model = self.model
+
+        @tf.function(
+            input_signature=[tf.TensorSpec([None, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3], tf.float32)],
+            jit_compile=bool(xla)
+        )
+        def infer(batch):
+            # Model ada 4 sigmoid heads, setiap satu [N,512,512,1] - concat dalam graph
+            return tf.concat(model([batch], training=False), axis=-1)
+
+        self._infer = infer
+
+    def predict_batch(self, batch):
+        """Run satu forward pass untuk batch [N,512,512,3] -> [N,512,512,4]"""
+        batch = np.asarray(batch, dtype=np.float32)
+        return self._infer(batch).numpy()
+
+    def warmup(self):
+        """Dummy forward pass supaya graph & kernels siap sebelum request pertama"""
+        dummy = np.zeros((1, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.float32)
+        self.predict_batch(dummy)
+
+
+def resolve_model_path(backend="keras"):
+    """Path model untuk backend: analysis.models.path, artifact .tflite, atau MODEL_PATH"""
+    model_path = get_setting("analysis.models.path")
+    if model_path:
+        return model_path if os.path.isabs(model_path) else os.path.join(BASE_DIR, model_path)
+    if backend == "keras":
+        return MODEL_PATH
+
+    from modules.quantization import QUANTIZATION_MODES, default_artifact_path
+
+    mode = backend.replace("tflite_", "", 1)
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown analysis backend: {backend}")
+
+    artifact_path = get_setting("analysis.tflite_path") or default_artifact_path(mode)
+    if not os.path.exists(artifact_path):
+        print(f"Quantized model {artifact_path} not found, using keras backend")
+        return MODEL_PATH
+    return artifact_path
+
+
+def use_model_server():
+    """True jika forward pass dihantar ke shared model server (python model_server.py)"""
+    return bool(get_setting("analysis.server.enabled", False))
+
+
+def create_engine(model_path=None):
+    """Bina engine ikut jenis fail: .keras (float32) atau .tflite (float16/int8)
+
+    Bila analysis.server.enabled, return proxy ke model server; jika server
+    tidak dapat dihubungi, model di-load dalam process ini.
+    """
+    if model_path is None and use_model_server():
+        from modules.model_server import RemoteEngine
+        socket_path = get_setting("analysis.server.socket", "/tmp/pinnalogy-model.sock")
+        try:
+            return RemoteEngine(socket_path, version_ttl=get_setting("analysis.server.version_ttl", 2.0))
+        except OSError as e:
+            print(f"Model server {socket_path} unavailable, loading model locally: {e}")
+
+    model_path = model_path or resolve_model_path(get_setting("analysis.backend", "keras"))
+    if model_path.endswith(".tflite"):
+        from modules.quantization import TFLiteEngine
+        return TFLiteEngine(model_path)
+    return EarSegmentationEngine(model_path)
+
+
+def get_registry():
+    """Get shared model registry - version pertama di-load & warmup sekali per process"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                from modules.model_registry import ModelRegistry
+
+                registry = ModelRegistry(create_engine, get_setting("analysis.models.keep_loaded", 2))
+                engine = registry.load()
+                # Hot reload: fail model diganti -> version baru di-swap tanpa restart
+                # (RemoteEngine tiada model_path - model server yang watch fail)
+                if engine.model_path:
+                    registry.start_watcher(engine.model_path, get_setting("analysis.models.watch_interval", 5))
+                _registry = registry
+    return _registry
+
+
+def get_engine():
+    """Get engine active (untuk warmup & metadata - request guna acquire_engine)"""
+    return get_registry().active()
+
+
+def acquire_engine():
+    """Context manager: pin engine active untuk satu request"""
+    return get_registry().acquire()
+
+
+def get_scheduler(engine=None):
+    """Get micro-batching scheduler untuk engine (None jika batching disabled)"""
+    if not get_setting("analysis.batching.enabled", True):
+        return None
+    engine = engine or get_engine()
+    if engine.model_path is None:
+        # RemoteEngine - batching dibuat dalam model server, merentasi semua app processes
+        return None
+    return get_registry().scheduler_for(engine)
+
+
+# ===== PREPROCESSING =====
+def prepare_input(image, out=None):
+    """Convert PIL image ke float32 array [512,512,3] dalam range 0-1 (out = buffer dari pool)"""
+    return resize_to_input(image, MODEL_INPUT_SIZE, out=out)
+
+
+def upload_is_tiled(image_bytes):
+    """Mode tiled dari header upload sahaja - tiada decode pixel"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as probe:
+        return use_tiling_size(probe.size)
+
+
+def load_upload(source):
+    """Decode upload pada resolusi yang diperlukan sahaja -> (image, tiled)
+
+    Mode tiled ditentukan dari saiz asal (header sahaja), kemudian JPEG
+    di-decode dekat dengan 512x512 atau saiz budget tiling.
+    """
+    from PIL import Image
+
+    with Image.open(source) as probe:
+        original_size = probe.size
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+    tiled = use_tiling_size(original_size)
+    if tiled:
+        from modules.tiling import fit_to_budget
+        target = fit_to_budget(
+            *original_size,
+            get_setting("analysis.tiling.max_memory_mb", 192),
+            get_setting("analysis.tiling.batch_size", 4)
+        )
+    else:
+        target = (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)
+    return decode_image(source, target), tiled
+
+
+# ===== SEGMENTATION =====
+def predict(batch, engine=None):
+    """Forward pass [N,512,512,3] -> [N,512,512,4]
+
+    Jika batching enabled, setiap item dihantar ke scheduler supaya
+    digabung dengan request lain dalam window yang sama. engine = version
+    yang di-pin oleh request (default: active).
+    """
+    engine = engine or get_engine()
+    scheduler = get_scheduler(engine)
+    if scheduler is None:
+        return engine.predict_batch(batch)
+    futures = [scheduler.submit(item) for item in batch]
+    return np.stack([future.result() for future in futures])
+
+
+def use_tiling_size(size):
+    """Tiled inference untuk upload resolusi tinggi (sisi terpanjang >= min_side)"""
+    if not get_setting("analysis.tiling.enabled", True):
+        return False
+    return max(size) >= get_setting("analysis.tiling.min_side", 1024)
+
+
+def segment_ear_tiled(image, engine=None, return_input=False):
+    """Segment image resolusi tinggi dengan overlapping 512x512 tiles -> [H,W,4]"""
+    from PIL import Image
+    from modules.tiling import fit_to_budget, tiled_predict
+
+    batch_size = get_setting("analysis.tiling.batch_size", 4)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    # Had memory buffers (bukan activation TF) - downscale dulu jika image terlalu besar
+    size = fit_to_budget(*image.size, get_setting("analysis.tiling.max_memory_mb", 192), batch_size)
+    if size != image.size:
+        image = image.resize(size, Image.BILINEAR)
+
+    # Tiles terus ke engine, bukan melalui scheduler - scheduler boleh gabung tiles dari
+    # request lain sehingga batching.max_batch_size dan lepas budget tiling.batch_size
+    engine = engine or get_engine()
+    pixels = np.asarray(image)
+    probs = tiled_predict(
+        pixels,
+        engine.predict_batch,
+        overlap=get_setting("analysis.tiling.overlap", 64),
+        batch_size=batch_size
+    )
+    return (probs, pixels) if return_input else probs
+
+
+def segment_ear_tta(inputs, engine=None):
+    """Test-time augmentation: asal + flip + scale variants dalam satu batched forward pass"""
+    from modules.tta import build_tta_batch, merge_tta_outputs
+
+    scales = tuple(get_setting("analysis.tta.scales", [0.9, 1.1]))
+    batch, boxes = build_tta_batch(inputs, scales)
+    return merge_tta_outputs(predict(batch, engine), boxes, scales)
+
+
+def segment_ear(image, tiled=None, tta=False, engine=None, return_input=False, out=None):
+    """Segment ear image -> sigmoid maps [H,W,4] ikut susunan EAR_REGIONS
+
+    Default 512x512; tiled=True (atau auto untuk image besar) return maps
+    pada resolusi image. tta=True untuk scan borderline (tidak digunakan
+    bersama tiled). return_input=True -> (maps, pixels) dengan pixels pada
+    resolusi sama seperti maps, untuk feature extraction tanpa decode semula.
+    out = buffer input dari input_buffer() (path 512 sahaja).
+    """
+    if tiled is None:
+        tiled = use_tiling_size(image.size)
+    if tiled:
+        return segment_ear_tiled(image, engine, return_input)
+
+    inputs = prepare_input(image, out=out)
+    if tta:
+        probs = segment_ear_tta(inputs, engine)
+    else:
+        probs = predict(inputs[np.newaxis], engine)[0]
+    return (probs, inputs) if return_input else probs
+
+
+def detect_zones(coverage, min_coverage=0.5):
+    """Senarai reflexology zones dengan coverage (%) >= min_coverage"""
+    return [
+        REGION_TO_ZONE[region] for region in EAR_REGIONS
+        if coverage[f"{region}_coverage"] >= min_coverage
+    ]
+
+
+# ===== ANALYSIS =====
+def rejected_scan_results(quality):
+    """Result bila quality gate tolak scan - tiada inference dijalankan"""
+    return {
+        'rejected': True,
+        'detected_zones': [],
+        'color_analysis': {"status": "Not analyzed - scan quality too low"},
+        'texture_analysis': {"status": "Not analyzed - scan quality too low"},
+        'structural_features': [],
+        'potential_concerns': quality['issues'],
+        'recommended_checks': ["Retake the photo: ear centred, in focus and evenly lit"],
+        'lifestyle_suggestions': [],
+        'confidence_level': "low",
+        'scan_quality': quality,
+        'analysis_date': datetime.now().isoformat()
+    }
+
+
+def analyze_ear(image, tiled=None, tta=False, engine=None, quality=None):
+    """Full analysis satu image -> results dict untuk display_analysis_results
+
+    Semua forward pass guna satu engine (version) - model_version dalam
+    result sentiasa model yang menghasilkan masks. Quality gate dijalankan
+    dulu (jika belum diberi); scan Poor tidak masuk model.
+    """
+    if quality is None and get_setting("analysis.quality.enabled", True):
+        from modules.quality import assess_quality
+        quality = assess_quality(image)
+    if quality is not None and not quality['usable']:
+        return rejected_scan_results(quality)
+
+    if engine is None:
+        with acquire_engine() as engine:
+            return analyze_ear(image, tiled, tta, engine, quality)
+
+    # Buffer input dari pool - pixels dipakai oleh features, dipulangkan selepas results siap
+    with input_buffer(MODEL_INPUT_SIZE) as buffer:
+        probs, pixels = segment_ear(image, tiled=tiled, tta=tta, engine=engine, return_input=True, out=buffer)
+        return build_analysis_results(probs, pixels, engine, tta=bool(tta and not tiled), quality=quality)
+
+
+def build_analysis_results(probs, pixels, engine, tta=False, quality=None):
+    """Sigmoid maps [H,W,4] + pixels sama resolusi -> results dict (coverage, findings, masks)"""
+    from modules.coverage import compute_region_coverage
+
+    coverage = compute_region_coverage(probs)
+    confidence = coverage['analysis_confidence']
+
+    missing = [region for region in EAR_REGIONS if coverage[f"{region}_coverage"] == 0]
+    potential_concerns = [f"{region.title()} region not clearly visible - consider retaking image" for region in missing]
+
+    analysis_results = {
+        'detected_zones': detect_zones(coverage),
+        'color_analysis': {"status": "Normal coloration patterns detected"},
+        'texture_analysis': {"status": "Healthy skin texture observed"},
+        'structural_features': ["Well-defined ear structure"] if not missing else ["Partial ear structure detected"],
+        'potential_concerns': potential_concerns,
+        'recommended_checks': ["Routine health screening"],
+        'lifestyle_suggestions': ["Maintain balanced diet and exercise"],
+        'confidence_level': "high" if confidence >= 0.8 else "moderate",
+        'region_coverage': coverage,
+        'model_version': engine.model_version,
+        'tta': tta,
+        'scan_quality': quality,
+        'analysis_date': datetime.now().isoformat()
+    }
+
+    if get_setting("analysis.features.enabled", True):
+        # Colour & texture dalam setiap region - guna pixels & masks yang sama, tiada decode semula
+        from modules.features import extract_region_features, summarize_color, summarize_texture
+
+        region_features = extract_region_features(pixels, probs)
+        analysis_results['region_features'] = region_features
+        analysis_results['color_analysis'] = summarize_color(region_features)
+        analysis_results['texture_analysis'] = summarize_texture(region_features)
+
+    if get_setting("analysis.masks.store", True):
+        # Masks compact (RLE/bitpack) supaya overlay boleh dirender semula tanpa forward pass
+        from modules.mask_codec import encode_masks, masks_from_probs
+
+        mask_blob = encode_masks(masks_from_probs(probs, MASK_THRESHOLD), engine.model_version)
+        analysis_results['mask_data'] = base64.b64encode(mask_blob).decode("ascii")
+
+    return analysis_results
+
+
+# ===== PAIRED LEFT/RIGHT =====
+def analyze_ear_pair(left_image, right_image, engine=None, qualities=None):
+    """Analysis kedua-dua telinga dalam satu forward pass (batch 2) -> (left, right) results
+
+    Kedua-dua image melalui path 512x512 (tanpa tiling/TTA) supaya boleh
+    dibandingkan. Scan yang ditolak quality gate tidak masuk batch.
+    """
+    images = (left_image, right_image)
+    if qualities is None:
+        qualities = [None, None]
+        if get_setting("analysis.quality.enabled", True):
+            from modules.quality import assess_quality
+            qualities = [assess_quality(image) for image in images]
+
+    if engine is None:
+        with acquire_engine() as engine:
+            return analyze_ear_pair(left_image, right_image, engine, qualities)
+
+    results = [
+        rejected_scan_results(quality) if quality is not None and not quality['usable'] else None
+        for quality in qualities
+    ]
+    todo = [i for i, result in enumerate(results) if result is None]
+    if todo:
+        inputs = np.stack([prepare_input(images[i]) for i in todo])
+        probs = predict(inputs, engine)
+        for k, i in enumerate(todo):
+            results[i] = build_analysis_results(probs[k], inputs[k], engine, quality=qualities[i])
+    return results[0], results[1]
+
+
+def pair_results(left, right):
+    """Gabung result kiri & kanan + asymmetry per region"""
+    from modules.coverage import compute_asymmetry
+
+    left = dict(left, ear_side="left")
+    right = dict(right, ear_side="right")
+    asymmetry = None
+    if left.get('region_coverage') and right.get('region_coverage'):
+        asymmetry = compute_asymmetry(left['region_coverage'], right['region_coverage'])
+    return {
+        'paired': True,
+        'left': left,
+        'right': right,
+        'asymmetry': asymmetry,
+        'model_version': left.get('model_version') or right.get('model_version'),
+        'analysis_date': datetime.now().isoformat()
+    }
+
+
+def analyze_pair_bytes(left_bytes, right_bytes):
+    """Paired analysis dari bytes upload - side yang sudah di-cache tidak masuk batch"""
+    from modules.result_cache import get_result_cache, make_key
+
+    size = (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE)
+    images = [decode_image(io.BytesIO(data), size) for data in (left_bytes, right_bytes)]
+
+    cache = get_result_cache()
+    with acquire_engine() as engine:
+        keys = [make_key(data, engine.model_version, "paired") for data in (left_bytes, right_bytes)]
+        sides = [cache.get(key) if cache is not None else None for key in keys]
+
+        if sides[0] is None and sides[1] is None:
+            sides = list(analyze_ear_pair(images[0], images[1], engine))
+        else:
+            for i, side in enumerate(sides):
+                if side is None:
+                    sides[i] = analyze_ear(images[i], tiled=False, engine=engine)
+
+    if cache is not None:
+        for data, side in zip((left_bytes, right_bytes), sides):
+            if not side.get('rejected'):
+                # Simpan ikut version yang hasilkan masks (server mungkin reload semasa predict)
+                cache.put(make_key(data, side['model_version'], "paired"), side)
+    return pair_results(sides[0], sides[1])
+
+
+def analyze_image_bytes(image_bytes, image=None, tiled=None, tta=False):
+    """Analysis dari bytes upload dengan result cache
+
+    Image & model sama tidak perlu forward pass lagi. Beri image/tiled jika
+    upload sudah di-decode (contoh untuk preview dalam UI).
+    """
+    from modules.result_cache import get_result_cache, make_key
+
+    if image is None:
+        image, tiled = load_upload(io.BytesIO(image_bytes))
+
+    cache = get_result_cache()
+    with acquire_engine() as engine:
+        if cache is None:
+            return analyze_ear(image, tiled, tta, engine)
+
+        variant = "tiled" if tiled else ("tta" if tta else "")
+        key = make_key(image_bytes, engine.model_version, variant)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        analysis_results = analyze_ear(image, tiled, tta, engine)
+    # Scan ditolak tidak di-cache - threshold quality mungkin berubah
+    if not analysis_results.get('rejected'):
+        # Simpan ikut version yang hasilkan masks (server mungkin reload semasa predict)
+        cache.put(make_key(image_bytes, analysis_results['model_version'], variant), analysis_results)
+    return analysis_results
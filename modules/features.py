@@ -0,0 +1,208 @@
+import numpy as np
+
+from modules.ear_analysis import EAR_REGIONS, MASK_THRESHOLD
+from utils.helpers import get_setting
+
+HIST_BINS = 8
+LBP_BINS = 10  # rotation-invariant uniform LBP, P=8: 0..8 + non-uniform
+VARIANCE_WINDOW = 5
+
+# (channel, range) untuk histogram - HSV & Lab dari cv2 dengan input float32 0-1
+HSV_CHANNELS = (("hue", 0.0, 360.0), ("saturation", 0.0, 1.0), ("value", 0.0, 1.0))
+LAB_CHANNELS = (("L", 0.0, 100.0), ("a", -60.0, 60.0), ("b", -60.0, 60.0))
+
+# 8 neighbours (dy, dx) mengikut putaran untuk LBP
+_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
+
+def _riu2_table():
+    """LBP code 0-255 -> bin rotation-invariant uniform (bilangan bit 1, atau 9 jika bukan uniform)"""
+    codes = np.arange(256)
+    bits = (codes[:, np.newaxis] >> np.arange(8)) & 1
+    transitions = (bits != np.roll(bits, 1, axis=1)).sum(axis=1)
+    return np.where(transitions <= 2, bits.sum(axis=1), LBP_BINS - 1).astype(np.int64)
+
+
+_RIU2 = _riu2_table()
+
+
+# ===== LABELS =====
+def region_labels(probs, threshold=MASK_THRESHOLD):
+    """Sigmoid maps [H,W,R] -> label map [H,W]: 0 = background, 1..R = region (argmax, sama macam coverage)"""
+    labels = probs.argmax(axis=-1)
+    peak = np.take_along_axis(probs, labels[..., np.newaxis], axis=-1)[..., 0]
+    labels += 1
+    labels[peak < threshold] = 0
+    return labels
+
+
+# ===== PER-REGION STATISTICS =====
+def _region_means(flat_labels, values, counts, n_labels):
+    """Purata values untuk setiap label dengan satu bincount"""
+    sums = np.bincount(flat_labels, weights=values.ravel(), minlength=n_labels)
+    return np.divide(sums, counts, out=np.zeros(n_labels), where=counts > 0)
+
+
+def _region_histograms(flat_labels, values, low, high, bins, counts, n_labels):
+    """Histogram ternormal [n_labels, bins] untuk semua region sekaligus"""
+    quantized = ((values.ravel() - low) * (bins / (high - low))).astype(np.int64)
+    np.clip(quantized, 0, bins - 1, out=quantized)
+    hist = np.bincount(flat_labels * bins + quantized, minlength=n_labels * bins).reshape(n_labels, bins)
+    return hist / np.maximum(counts, 1)[:, np.newaxis]
+
+
+def lbp_codes(gray):
+    """8-neighbour LBP untuk setiap pixel (tepi di-pad) -> bin riu2 [H,W]"""
+    padded = np.pad(gray, 1, mode="edge")
+    height, width = gray.shape
+    codes = np.zeros(gray.shape, dtype=np.uint8)
+    for bit, (dy, dx) in enumerate(_NEIGHBOURS):
+        neighbour = padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+        codes |= (neighbour >= gray).astype(np.uint8) << bit
+    return _RIU2[codes]
+
+
+def local_variance(gray, window=VARIANCE_WINDOW):
+    """Variance dalam window window x window sekitar setiap pixel"""
+    import cv2
+
+    mean = cv2.blur(gray, (window, window))
+    mean_sq = cv2.blur(gray * gray, (window, window))
+    return np.maximum(mean_sq - mean * mean, 0)
+
+
+def downscale_for_features(image, probs, max_side):
+    """Salinan kecil (sisi panjang <= max_side) untuk features - path tiled boleh ~5 MP
+
+    Pixels guna INTER_AREA; probs guna INTER_NEAREST supaya region tidak bercampur.
+    """
+    import cv2
+
+    height, width = probs.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return image, probs
+    scale = max_side / float(max(height, width))
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    probs = cv2.resize(probs, size, interpolation=cv2.INTER_NEAREST)
+    return image, probs
+
+
+def extract_region_features(image, probs, threshold=MASK_THRESHOLD, max_side=None):
+    """Colour & texture features dalam setiap predicted region -> dict ikut EAR_REGIONS
+
+    image = array yang sudah di-decode (model input float32 0-1 atau uint8)
+    pada resolusi sama dengan probs [H,W,4]. Semua region dikira sekaligus:
+    satu label map, kemudian bincount untuk means & histograms. Input lebih
+    besar dari max_side (analysis.features.max_side) dikecilkan dahulu.
+    """
+    import cv2
+
+    if max_side is None:
+        max_side = get_setting("analysis.features.max_side", 1024)
+    image, probs = downscale_for_features(np.asarray(image), np.asarray(probs, dtype=np.float32), max_side)
+    if image.dtype != np.float32:
+        image = image.astype(np.float32) * (1.0 / 255.0)
+
+    labels = region_labels(np.asarray(probs), threshold)
+    n_labels = len(EAR_REGIONS) + 1
+    flat_labels = labels.ravel()
+    counts = np.bincount(flat_labels, minlength=n_labels)
+
+    hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+    lab = cv2.cvtColor(image, cv2.COLOR_RGB2Lab)
+
+    histograms = {}
+    for space, channels, array in (("hsv", HSV_CHANNELS, hsv), ("lab", LAB_CHANNELS, lab)):
+        for i, (name, low, high) in enumerate(channels):
+            histograms[f"{space}_{name}"] = _region_histograms(
+                flat_labels, array[..., i], low, high, HIST_BINS, counts, n_labels
+            )
+
+    # Redness: purata a* (Lab) dan erythema index log(R) - log(G)
+    eps = 1.0 / 255.0
+    erythema = np.log10(image[..., 0] + eps) - np.log10(image[..., 1] + eps)
+    redness = _region_means(flat_labels, lab[..., 1], counts, n_labels)
+    erythema_index = _region_means(flat_labels, erythema, counts, n_labels)
+    saturation = _region_means(flat_labels, hsv[..., 1], counts, n_labels)
+    brightness = _region_means(flat_labels, lab[..., 0], counts, n_labels)
+
+    # Texture atas lightness L*
+    gray = np.ascontiguousarray(lab[..., 0])
+    lbp_hist = np.bincount(flat_labels * LBP_BINS + lbp_codes(gray).ravel(),
+                           minlength=n_labels * LBP_BINS).reshape(n_labels, LBP_BINS)
+    lbp_hist = lbp_hist / np.maximum(counts, 1)[:, np.newaxis]
+    lbp_entropy = -(lbp_hist * np.log2(np.where(lbp_hist > 0, lbp_hist, 1.0))).sum(axis=1)
+    variance = _region_means(flat_labels, local_variance(gray), counts, n_labels)
+
+    features = {}
+    for label, region in enumerate(EAR_REGIONS, 1):
+        if not counts[label]:
+            continue
+        features[region] = {
+            'pixels': int(counts[label]),
+            'redness_a': round(float(redness[label]), 2),
+            'erythema_index': round(float(erythema_index[label]), 4),
+            'saturation': round(float(saturation[label]), 3),
+            'lightness': round(float(brightness[label]), 2),
+            'lbp_entropy': round(float(lbp_entropy[label]), 3),
+            'lbp_uniformity': round(float(1.0 - lbp_hist[label, -1]), 3),
+            'local_variance': round(float(variance[label]), 3),
+            'histograms': {name: np.round(hist[label], 4).tolist() for name, hist in histograms.items()},
+            'lbp_histogram': np.round(lbp_hist[label], 4).tolist()
+        }
+    return features
+
+
+# ===== FINDINGS =====
+def summarize_color(features):
+    """Region features -> color_analysis dict untuk display_analysis_results"""
+    if not features:
+        return {"status": "No ear regions detected for colour analysis"}
+
+    redness_delta = get_setting("analysis.features.redness_delta", 6.0)
+    pallor_lightness = get_setting("analysis.features.pallor_lightness", 80.0)
+    weights = np.array([f['pixels'] for f in features.values()], dtype=np.float64)
+    ear_redness = float(np.average([f['redness_a'] for f in features.values()], weights=weights))
+
+    findings = {}
+    elevated = []
+    for region, f in features.items():
+        note = f"a* {f['redness_a']:.1f}, erythema {f['erythema_index']:.3f}, L* {f['lightness']:.0f}"
+        if f['redness_a'] - ear_redness > redness_delta:
+            note += " - elevated redness"
+            elevated.append(region.title())
+        elif f['lightness'] > pallor_lightness and f['redness_a'] < ear_redness:
+            note += " - pale"
+        findings[region.title()] = note
+
+    if elevated:
+        status = f"Localised redness in {', '.join(elevated)}"
+    else:
+        status = "Normal coloration patterns detected"
+    return {"status": status, **findings}
+
+
+def summarize_texture(features):
+    """Region features -> texture_analysis dict untuk display_analysis_results"""
+    if not features:
+        return {"status": "No ear regions detected for texture analysis"}
+
+    variance_ratio = get_setting("analysis.features.texture_variance_ratio", 2.0)
+    weights = np.array([f['pixels'] for f in features.values()], dtype=np.float64)
+    ear_variance = float(np.average([f['local_variance'] for f in features.values()], weights=weights))
+
+    findings = {}
+    irregular = []
+    for region, f in features.items():
+        note = f"LBP entropy {f['lbp_entropy']:.2f}, local variance {f['local_variance']:.2f}"
+        if ear_variance > 0 and f['local_variance'] > ear_variance * variance_ratio:
+            note += " - texture irregularities"
+            irregular.append(region.title())
+        findings[region.title()] = note
+
+    if irregular:
+        status = f"Mild texture irregularities in {', '.join(irregular)}"
+    else:
+        status = "Healthy skin texture observed"
+    return {"status": status, **findings}
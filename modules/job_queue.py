@@ -0,0 +1,219 @@
+import hashlib
+import json
+import time
+
+import psycopg2
+
+from database.connection import connection
+from database.models import ensure_schema
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+# ===== TABLE SETUP =====
+def init_job_table():
+    """Pastikan analysis_jobs wujud - melalui migrations dalam database/models.py"""
+    ensure_schema()
+
+
+# ===== PRODUCER (STREAMLIT APP) =====
+def enqueue_job(image_bytes, patient_id=None, user_id=None, tta=False, right_image_bytes=None):
+    """Masukkan job analysis baru -> job id (right_image_bytes = paired left/right job)"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO analysis_jobs (patient_id, user_id, image_data, image_sha256, tta, image_data_right)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (patient_id, user_id, psycopg2.Binary(image_bytes), hashlib.sha256(image_bytes).hexdigest(), tta,
+              psycopg2.Binary(right_image_bytes) if right_image_bytes is not None else None))
+        job_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    return job_id
+
+
+def get_job_status(job_id):
+    """Status job untuk polling UI -> dict (status, result, error) atau None"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT status, result, error,
+                   (SELECT COUNT(*) FROM analysis_jobs q WHERE q.status = 'queued' AND q.id < j.id)
+            FROM analysis_jobs j
+            WHERE id = %s
+        """, (job_id,))
+        row = cur.fetchone()
+        cur.close()
+
+    if row is None:
+        return None
+    return {
+        'status': row[0],
+        'result': row[1],
+        'error': row[2],
+        'queue_position': row[3]
+    }
+
+
+# ===== CONSUMER (ANALYSIS WORKER) =====
+def claim_job(conn):
+    """Ambil satu queued job - SKIP LOCKED supaya banyak worker tidak berebut job sama"""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE analysis_jobs
+        SET status = 'running', started_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+        WHERE id = (
+            SELECT id FROM analysis_jobs
+            WHERE status = 'queued'
+            ORDER BY id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, patient_id, image_data, tta, image_data_right
+    """)
+    row = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    if row is None:
+        return None
+    return {
+        'id': row[0],
+        'patient_id': row[1],
+        'image_bytes': bytes(row[2]),
+        'tta': bool(row[3]),
+        'right_image_bytes': bytes(row[4]) if row[4] is not None else None
+    }
+
+
+def complete_job(conn, job_id, result):
+    """Simpan result dan tandakan job done - image bytes dibuang, tidak diperlukan lagi"""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE analysis_jobs
+        SET status = 'done', result = %s, model_version = %s, finished_at = CURRENT_TIMESTAMP,
+            image_data = NULL, image_data_right = NULL
+        WHERE id = %s
+    """, (json.dumps(result, default=str), result.get('model_version'), job_id))
+    conn.commit()
+    cur.close()
+
+
+def fail_job(conn, job_id, error):
+    """Tandakan job failed dengan error message (image bytes dibuang)"""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE analysis_jobs
+        SET status = 'failed', error = %s, finished_at = CURRENT_TIMESTAMP,
+            image_data = NULL, image_data_right = NULL
+        WHERE id = %s
+    """, (str(error), job_id))
+    conn.commit()
+    cur.close()
+
+
+def requeue_stale_jobs(conn, timeout_seconds=300, max_attempts=3):
+    """Job 'running' terlalu lama (worker crash) - queue semula atau fail selepas max_attempts"""
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE analysis_jobs
+        SET status = CASE WHEN attempts >= %s THEN 'failed' ELSE 'queued' END,
+            error = CASE WHEN attempts >= %s THEN 'Worker timeout' ELSE error END,
+            image_data = CASE WHEN attempts >= %s THEN NULL ELSE image_data END,
+            image_data_right = CASE WHEN attempts >= %s THEN NULL ELSE image_data_right END
+        WHERE status = 'running'
+          AND started_at < CURRENT_TIMESTAMP - (%s * INTERVAL '1 second')
+    """, (max_attempts, max_attempts, max_attempts, max_attempts, timeout_seconds))
+    requeued = cur.rowcount
+    conn.commit()
+    cur.close()
+    return requeued
+
+
+# ===== WORKER LOOP =====
+def _fail_claimed_job(job_id, error):
+    """fail_job dengan connection sendiri - dipanggil dari error handler, jadi tidak raise"""
+    try:
+        with connection() as conn:
+            fail_job(conn, job_id, error)
+    except Exception as e:
+        print(f"Failing analysis job {job_id} failed: {e}")
+
+
+def run_worker(stop_event, poll_interval=0.5, stale_timeout=300, max_backoff=60):
+    """Loop worker: claim job, run analysis, simpan result - sehingga stop_event diset
+
+    Connection dari pool hanya dipegang untuk query (claim, save + complete,
+    fail) - dipulangkan sebelum tunggu queue kosong dan sebelum inference.
+    Error (model gagal load, database) tidak stop thread: job yang sudah
+    di-claim ditanda failed dan loop cuba semula dengan backoff.
+    """
+    from modules.analysis_store import save_ear_analysis, save_ear_analysis_pair
+    from modules.ear_analysis import analyze_image_bytes, analyze_pair_bytes, get_engine
+
+    engine_ready = False
+    backoff = poll_interval
+    last_stale_check = 0.0
+
+    while not stop_event.is_set():
+        job = None
+        try:
+            with connection() as conn:
+                # Sekali-sekala pulihkan job dari worker yang crash
+                now = time.monotonic()
+                if now - last_stale_check > stale_timeout / 2:
+                    requeue_stale_jobs(conn, stale_timeout)
+                    last_stale_check = now
+                job = claim_job(conn)
+
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+
+            if not engine_ready:
+                # Load model di sini (bukan sebelum loop) - model rosak fail job, bukan matikan thread
+                get_engine()
+                engine_ready = True
+
+            try:
+                if job['right_image_bytes'] is not None:
+                    result = analyze_pair_bytes(job['image_bytes'], job['right_image_bytes'])
+                else:
+                    result = analyze_image_bytes(job['image_bytes'], tta=job['tta'])
+            except Exception as e:
+                print(f"Analysis job {job['id']} failed: {e}")
+                _fail_claimed_job(job['id'], e)
+                continue
+
+            with connection() as conn:
+                try:
+                    if result.get('paired'):
+                        if job['patient_id'] is not None:
+                            save_ear_analysis_pair(conn, job['patient_id'], result)
+                        for side in ("left", "right"):
+                            result[side].pop('mask_data', None)
+                    else:
+                        # Salinan - result mungkin object dari memory cache
+                        result = dict(result)
+                        if job['patient_id'] is not None and not result.get('rejected'):
+                            result['analysis_id'] = save_ear_analysis(conn, job['patient_id'], result)
+                        # Masks sudah dalam ear_analyses.mask_data - jangan hantar ke UI
+                        result.pop('mask_data', None)
+                    complete_job(conn, job['id'], result)
+                except Exception as e:
+                    # Jangan tinggal job 'running' - requeue_stale_jobs akan ulang inference
+                    print(f"Saving analysis job {job['id']} failed: {e}")
+                    conn.rollback()
+                    fail_job(conn, job['id'], e)
+            backoff = poll_interval
+
+        except Exception as e:
+            print(f"Analysis worker error: {e}")
+            if job is not None:
+                _fail_claimed_job(job['id'], e)
+            stop_event.wait(backoff)
+            backoff = min(backoff * 2, max_backoff)
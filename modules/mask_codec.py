@@ -0,0 +1,126 @@
+"""Compact binary format untuk segmentation masks (ear_analyses.mask_data)
+
+Layout (little-endian):
+    header  : magic "PMSK", format version (u8), n_regions (u8),
+              height (u32), width (u32), model version length (u8)
+    model version (utf-8)
+    setiap region : encoding (u8), payload length (u32), payload
+
+Encoding dipilih per region, yang mana lebih kecil:
+    bitpack : np.packbits atas mask yang di-flatten (row-major)
+    rle16 / rle32 : panjang run berselang-seli, bermula dengan run 0 (background)
+"""
+import struct
+
+import numpy as np
+
+MAGIC = b"PMSK"
+FORMAT_VERSION = 1
+
+ENCODING_BITPACK = 0
+ENCODING_RLE16 = 1
+ENCODING_RLE32 = 2
+
+_HEADER = struct.Struct("<4sBBIIB")
+_REGION = struct.Struct("<BI")
+
+
+def masks_from_probs(probs, threshold=0.5):
+    """Sigmoid maps [H,W,R] -> boolean masks [H,W,R] tanpa overlap (argmax, sama macam coverage)"""
+    probs = np.asarray(probs)
+    labels = probs.argmax(axis=-1)
+    foreground = np.take_along_axis(probs, labels[..., np.newaxis], axis=-1)[..., 0] >= threshold
+    masks = np.zeros(probs.shape, dtype=bool)
+    np.put_along_axis(masks, labels[..., np.newaxis], foreground[..., np.newaxis], axis=-1)
+    return masks
+
+
+# ===== ENCODE =====
+def _run_lengths(flat):
+    """Panjang run berselang-seli bermula dengan False"""
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    runs = np.diff(bounds)
+    if flat.size and flat[0]:
+        runs = np.concatenate(([0], runs))
+    return runs
+
+
+def _encode_region(mask):
+    flat = mask.ravel()
+    bitpacked = np.packbits(flat).tobytes()
+
+    runs = _run_lengths(flat)
+    if runs.size and runs.max() < 2 ** 16:
+        encoding, rle = ENCODING_RLE16, runs.astype("<u2").tobytes()
+    else:
+        encoding, rle = ENCODING_RLE32, runs.astype("<u4").tobytes()
+
+    if len(rle) < len(bitpacked):
+        return encoding, rle
+    return ENCODING_BITPACK, bitpacked
+
+
+def encode_masks(masks, model_version=""):
+    """Boolean masks [H,W,R] -> bytes"""
+    masks = np.asarray(masks, dtype=bool)
+    height, width, n_regions = masks.shape
+    version = model_version.encode("utf-8")[:255]
+
+    parts = [_HEADER.pack(MAGIC, FORMAT_VERSION, n_regions, height, width, len(version)), version]
+    # Transpose sekali supaya setiap region contiguous
+    for region_mask in np.moveaxis(masks, -1, 0):
+        encoding, payload = _encode_region(region_mask)
+        parts.append(_REGION.pack(encoding, len(payload)))
+        parts.append(payload)
+    return b"".join(parts)
+
+
+# ===== DECODE =====
+def read_header(data):
+    """Header sahaja -> dict (height, width, n_regions, model_version)"""
+    data = memoryview(data)
+    magic, version, n_regions, height, width, version_len = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a Pinnalogy mask blob")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported mask format version: {version}")
+    offset = _HEADER.size
+    model_version = bytes(data[offset:offset + version_len]).decode("utf-8")
+    return {
+        'height': height,
+        'width': width,
+        'n_regions': n_regions,
+        'model_version': model_version,
+        'offset': offset + version_len
+    }
+
+
+def decode_masks(data):
+    """Bytes -> (boolean masks [H,W,R], model_version)
+
+    Payload dibaca terus dengan np.frombuffer (tanpa salinan) dan ditulis
+    ke dalam satu array output.
+    """
+    data = memoryview(data)
+    header = read_header(data)
+    height, width, n_regions = header['height'], header['width'], header['n_regions']
+    size = height * width
+
+    masks = np.empty((n_regions, size), dtype=bool)
+    offset = header['offset']
+    for i in range(n_regions):
+        encoding, length = _REGION.unpack_from(data, offset)
+        offset += _REGION.size
+        payload = data[offset:offset + length]
+        offset += length
+
+        if encoding == ENCODING_BITPACK:
+            bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8), count=size)
+            masks[i] = bits.view(bool)
+        else:
+            runs = np.frombuffer(payload, dtype="<u2" if encoding == ENCODING_RLE16 else "<u4")
+            values = np.arange(runs.size) % 2 == 1
+            masks[i] = np.repeat(values, runs)
+
+    return np.moveaxis(masks.reshape(n_regions, height, width), 0, -1), header['model_version']
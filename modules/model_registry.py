@@ -0,0 +1,175 @@
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from modules.batching import MicroBatchScheduler
+from utils.helpers import get_setting
+
+
+# ===== MODEL REGISTRY =====
+class ModelRegistry:
+    """Beberapa model versions dalam memory, satu active - swap tanpa restart
+
+    Versi baru di-load & warm up di luar lock, kemudian di-swap secara
+    atomik. Request pegang engine melalui acquire(), jadi request yang
+    sedang berjalan habis atas model lama; versi lama hanya di-unload bila
+    tiada request lagi yang menggunakannya.
+    """
+
+    def __init__(self, build_engine, keep_loaded=2):
+        self.build_engine = build_engine
+        self.keep_loaded = max(1, int(keep_loaded))
+
+        self._engines = OrderedDict()  # version -> engine, ikut susunan activate
+        self._schedulers = {}
+        self._in_flight = {}
+        self._retired = set()
+        self._active = None
+        self._lock = threading.Lock()
+        self._watcher_stop = None
+
+    def active(self):
+        """Engine yang menerima request baru"""
+        return self._active
+
+    def versions(self):
+        """Senarai versions yang di-load -> list dict (version, path, active, in_flight)"""
+        with self._lock:
+            return [
+                {
+                    'version': version,
+                    'path': engine.model_path,
+                    'active': engine is self._active,
+                    'in_flight': self._in_flight.get(version, 0)
+                }
+                for version, engine in self._engines.items()
+            ]
+
+    # ===== LOAD & SWAP =====
+    def load(self, model_path=None, activate=True):
+        """Load + warmup satu version (blocking), kemudian activate -> engine"""
+        engine = self.build_engine(model_path)
+        engine.warmup()
+
+        with self._lock:
+            existing = self._engines.get(engine.model_version)
+            if existing is not None and engine.model_version not in self._retired:
+                # Kandungan sama sudah di-load - buang salinan baru
+                engine = existing
+            else:
+                self._retired.discard(engine.model_version)
+                self._engines[engine.model_version] = engine
+            if activate:
+                self._activate(engine.model_version)
+        return engine
+
+    def load_in_background(self, model_path=None, activate=True):
+        """Load version baru dalam thread - request terus dilayan oleh model active"""
+        def run():
+            try:
+                engine = self.load(model_path, activate)
+                print(f"Model {engine.model_version} loaded{' and activated' if activate else ''}")
+            except Exception as e:
+                print(f"Model load warning: {e}")
+
+        thread = threading.Thread(target=run, name="model-registry-load", daemon=True)
+        thread.start()
+        return thread
+
+    def activate(self, version):
+        """Swap ke version yang sudah di-load"""
+        with self._lock:
+            if version not in self._engines or version in self._retired:
+                raise KeyError(f"Model version not loaded: {version}")
+            self._activate(version)
+
+    def _activate(self, version):
+        # Satu assignment - request baru terus nampak engine baru
+        self._active = self._engines[version]
+        self._engines.move_to_end(version)
+
+        # Versi paling lama melebihi keep_loaded di-retire; unload bila tiada in-flight
+        for old_version in list(self._engines)[:-self.keep_loaded]:
+            self._retired.add(old_version)
+        for old_version in list(self._retired):
+            if not self._in_flight.get(old_version):
+                self._unload(old_version)
+
+    def _unload(self, version):
+        self._retired.discard(version)
+        self._engines.pop(version, None)
+        scheduler = self._schedulers.pop(version, None)
+        if scheduler is not None:
+            # Tiada in-flight request, jadi queue sudah kosong - close tidak block lama
+            threading.Thread(target=scheduler.close, daemon=True).start()
+
+    # ===== REQUESTS =====
+    @contextmanager
+    def acquire(self):
+        """Pin engine active untuk satu request - selamat walaupun swap berlaku di tengah"""
+        with self._lock:
+            engine = self._active
+            version = engine.model_version
+            self._in_flight[version] = self._in_flight.get(version, 0) + 1
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._in_flight[version] -= 1
+                if not self._in_flight[version]:
+                    del self._in_flight[version]
+                    if version in self._retired:
+                        self._unload(version)
+
+    def scheduler_for(self, engine):
+        """Micro-batching scheduler per version - batch tidak pernah campur dua model"""
+        with self._lock:
+            scheduler = self._schedulers.get(engine.model_version)
+            if scheduler is None:
+                scheduler = MicroBatchScheduler(
+                    engine.predict_batch,
+                    window_ms=get_setting("analysis.batching.window_ms", 15),
+                    max_batch_size=get_setting("analysis.batching.max_batch_size", 8)
+                )
+                self._schedulers[engine.model_version] = scheduler
+            return scheduler
+
+    # ===== HOT RELOAD =====
+    def start_watcher(self, model_path, interval=5.0):
+        """Poll model_path; bila fail diganti, load & activate version baru dalam background
+
+        Ganti fail secara atomik (copy ke fail sementara, kemudian mv) supaya
+        fail separuh ditulis tidak di-load.
+        """
+        if self._watcher_stop is not None or not interval:
+            return
+        stop_event = self._watcher_stop = threading.Event()
+
+        def signature():
+            try:
+                stat = os.stat(model_path)
+                return stat.st_mtime_ns, stat.st_size
+            except OSError:
+                return None
+
+        def watch():
+            last = signature()
+            while not stop_event.wait(interval):
+                current = signature()
+                if current is None or current == last:
+                    continue
+                last = current
+                try:
+                    engine = self.load(model_path)
+                    print(f"Model file changed, now serving {engine.model_version}")
+                except Exception as e:
+                    # Kekal guna model active; cuba lagi bila fail berubah semula
+                    print(f"Model reload warning: {e}")
+
+        threading.Thread(target=watch, name="model-registry-watcher", daemon=True).start()
+
+    def stop_watcher(self):
+        if self._watcher_stop is not None:
+            self._watcher_stop.set()
+            self._watcher_stop = None
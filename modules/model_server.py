@@ -0,0 +1,276 @@
+"""Shared model server - satu process pegang model untuk semua app processes
+
+Protocol atas Unix domain socket: setiap message = panjang (u32 little-endian)
++ JSON. Tensors tidak melalui socket; client tulis input [N,512,512,3] ke
+dalam satu shared memory segment dan server tulis output [N,512,512,4]
+terus selepas input dalam segment yang sama.
+
+    {"op": "info"}                                   -> {"ok", "model_version"}
+    {"op": "predict", "shm": name, "shape": [N,H,W,3]} -> {"ok", "model_version"}
+
+Setiap predict di-pin pada satu model version; request dari semua client
+masuk ke micro-batching scheduler yang sama dalam server.
+"""
+import atexit
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_LENGTH = struct.Struct("<I")
+
+
+# ===== FRAMING =====
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+def recv_message(sock):
+    """Satu message JSON -> dict, atau None bila connection ditutup"""
+    header = _recv_exact(sock, _LENGTH.size)
+    if header is None:
+        return None
+    body = _recv_exact(sock, _LENGTH.unpack(header)[0])
+    if body is None:
+        return None
+    return json.loads(body)
+
+
+def send_message(sock, message):
+    body = json.dumps(message).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(body)) + body)
+
+
+def attach_segment(name):
+    """Attach shared memory milik client - server tidak unlink segment ini"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: resource_tracker akan unlink segment bila server exit
+        from multiprocessing import resource_tracker
+        segment = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+
+# ===== SERVER =====
+def _handle_request(request, segments):
+    from modules.ear_analysis import EAR_REGIONS, acquire_engine, get_engine, predict
+
+    if request.get('op') == "info":
+        return {'ok': True, 'model_version': get_engine().model_version}
+    if request.get('op') != "predict":
+        raise ValueError(f"Unknown op: {request.get('op')}")
+
+    name = request['shm']
+    if name not in segments:
+        # Client buat segment baru bila perlu lebih besar - tutup yang lama
+        for old in segments.values():
+            old.close()
+        segments.clear()
+        segments[name] = attach_segment(name)
+    segment = segments[name]
+
+    shape = tuple(request['shape'])
+    inputs = np.ndarray(shape, dtype=np.float32, buffer=segment.buf)
+    outputs = np.ndarray(shape[:3] + (len(EAR_REGIONS),), dtype=np.float32,
+                         buffer=segment.buf, offset=inputs.nbytes)
+    try:
+        with acquire_engine() as engine:
+            outputs[...] = predict(inputs, engine)
+        return {'ok': True, 'model_version': engine.model_version}
+    finally:
+        # View mesti dilepaskan sebelum segment boleh di-close
+        del inputs, outputs
+
+
+def _serve_connection(conn):
+    segments = {}
+    try:
+        while True:
+            request = recv_message(conn)
+            if request is None:
+                break
+            try:
+                response = _handle_request(request, segments)
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            send_message(conn, response)
+    except OSError as e:
+        print(f"Model server connection warning: {e}")
+    finally:
+        for segment in segments.values():
+            segment.close()
+        conn.close()
+
+
+def serve(socket_path, stop_event):
+    """Terima connections sehingga stop_event diset - satu thread per client"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o660)
+    server.listen()
+    server.settimeout(0.5)
+
+    try:
+        while not stop_event.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            threading.Thread(target=_serve_connection, args=(conn,), name="model-server-conn", daemon=True).start()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# ===== CLIENT =====
+class _Channel:
+    """Satu connection + shared memory segment, digunakan oleh satu request pada satu masa"""
+
+    def __init__(self, socket_path, timeout):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.segment = None
+
+    def request(self, message):
+        send_message(self.sock, message)
+        response = recv_message(self.sock)
+        if response is None:
+            raise ConnectionError("Model server closed the connection")
+        if not response.get('ok'):
+            raise RuntimeError(f"Model server error: {response.get('error')}")
+        return response
+
+    def ensure_segment(self, size):
+        if self.segment is None or self.segment.size < size:
+            self.release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=size)
+        return self.segment
+
+    def release_segment(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def close(self):
+        self.release_segment()
+        self.sock.close()
+
+
+class RemoteEngine:
+    """Engine proxy - forward pass dijalankan oleh model server
+
+    Interface sama macam EarSegmentationEngine (predict_batch, warmup,
+    model_version). model_version = version semasa dalam server (op info,
+    di-cache version_ttl saat; setiap predict juga kemas kini), jadi cache
+    key tidak guna version lama selepas server hot reload.
+    """
+
+    def __init__(self, socket_path, timeout=120, version_ttl=2.0):
+        self.socket_path = socket_path
+        self.model_path = None
+        self.timeout = timeout
+        self.version_ttl = version_ttl
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._server_version = None
+        self._version_checked = 0.0
+        self.warmup()
+        atexit.register(self.close)
+
+    def _set_version(self, version):
+        self._server_version = version
+        self._version_checked = time.monotonic()
+
+    @property
+    def model_version(self):
+        if time.monotonic() - self._version_checked > self.version_ttl:
+            try:
+                self.warmup()
+            except (OSError, RuntimeError) as e:
+                # Server tidak dapat dihubungi - predict seterusnya akan raise
+                print(f"Model server version check warning: {e}")
+        return self._server_version
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return _Channel(self.socket_path, self.timeout)
+
+    def _checkin(self, channel):
+        with self._lock:
+            self._idle.append(channel)
+
+    def _request(self, message, batch=None):
+        channel = self._checkout()
+        try:
+            outputs = None
+            if batch is not None:
+                from modules.ear_analysis import EAR_REGIONS
+
+                out_shape = batch.shape[:3] + (len(EAR_REGIONS),)
+                out_bytes = int(np.prod(out_shape)) * 4
+                segment = channel.ensure_segment(batch.nbytes + out_bytes)
+                np.ndarray(batch.shape, dtype=np.float32, buffer=segment.buf)[...] = batch
+                message = dict(message, shm=segment.name, shape=list(batch.shape))
+
+            response = channel.request(message)
+
+            if batch is not None:
+                # Salin keluar - segment dipakai semula oleh request seterusnya
+                outputs = np.ndarray(out_shape, dtype=np.float32, buffer=segment.buf, offset=batch.nbytes).copy()
+                response['outputs'] = outputs
+        except (OSError, ConnectionError):
+            channel.close()
+            raise
+        except Exception:
+            self._checkin(channel)
+            raise
+        self._checkin(channel)
+        return response
+
+    def predict_batch(self, batch):
+        """Forward pass [N,512,512,3] -> [N,512,512,4] melalui model server"""
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        try:
+            response = self._request({'op': 'predict'}, batch)
+        except (ConnectionError, FileNotFoundError):
+            # Server restart (connection putus / socket belum wujud) - cuba sekali lagi.
+            # Timeout tidak diulang: server yang hang akan buat caller tunggu 2x timeout
+            response = self._request({'op': 'predict'}, batch)
+        self._set_version(response['model_version'])
+        return response['outputs']
+
+    def warmup(self):
+        """Server sudah warm up model - cukup semak connection"""
+        self._set_version(self._request({'op': 'info'})['model_version'])
+
+    def close(self):
+        with self._lock:
+            channels, self._idle = self._idle, []
+        for channel in channels:
+            try:
+                channel.close()
+            except OSError:
+                pass
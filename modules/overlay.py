@@ -0,0 +1,41 @@
+import numpy as np
+
+from modules.ear_analysis import EAR_REGIONS
+
+# Warna RGB setiap region (helix, antihelix, concha, lobule)
+REGION_COLORS = {
+    "helix": (255, 75, 75),
+    "antihelix": (75, 160, 255),
+    "concha": (80, 200, 120),
+    "lobule": (255, 190, 60)
+}
+
+
+def render_overlay(masks, base=None, alpha=0.45):
+    """Boolean masks [H,W,4] -> RGB uint8 overlay; base = image (PIL/array) jika ada
+
+    Tanpa base, region diwarnakan atas latar putih. Dengan base, output ikut
+    saiz & aspect ratio base - label map yang di-resize (INTER_NEAREST).
+    """
+    masks = np.asarray(masks, dtype=bool)
+
+    # Label 0 = background, 1..4 = region (masks tidak bertindih)
+    labels = np.where(masks.any(axis=-1), masks.argmax(axis=-1) + 1, 0).astype(np.uint8)
+    lut = np.array([(255, 255, 255)] + [REGION_COLORS[region] for region in EAR_REGIONS], dtype=np.uint8)
+
+    if base is None:
+        return lut[labels]
+
+    import cv2
+
+    base = np.asarray(base.convert("RGB") if hasattr(base, "convert") else base, dtype=np.uint8)
+    height, width = base.shape[:2]
+    if labels.shape != (height, width):
+        labels = cv2.resize(labels, (width, height), interpolation=cv2.INTER_NEAREST)
+
+    colored = lut[labels]
+    blended = cv2.addWeighted(base, 1 - alpha, colored, alpha, 0)
+    foreground = labels > 0
+    out = base.copy()
+    out[foreground] = blended[foreground]
+    return out
@@ -1 +1,124 @@
+"""Patient listing dengan keyset pagination atas (created_at, id)
 
+List view hanya ambil columns yang dipaparkan; contact_info & medical_history
+(TEXT) di-load bila satu row dibuka. Semua filter dibuat dalam SQL, jadi
+saiz page tetap walaupun ada ribuan patients.
+
+user_id=None bermaksud semua patients (admin); selain itu hanya patients
+milik user tersebut (jika column patients.user_id wujud).
+"""
+from database.connection import connection
+from database.schema import has_column
+
+PAGE_SIZE = 25
+
+# Susunan sama macam index lama (id, code, name, age, gender) + created_at
+LIST_COLUMNS = "id, patient_code, full_name, age, gender, created_at"
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _filters(conn, user_id=None, search=None, code_prefix=None, exclude_prefix=None):
+    """WHERE clauses + params yang dikongsi oleh list & stats"""
+    clauses, params = [], []
+    if user_id is not None and has_column('patients', 'user_id', conn):
+        clauses.append("user_id = %s")
+        params.append(user_id)
+    if search:
+        pattern = f"%{_escape_like(search.strip())}%"
+        clauses.append("(full_name ILIKE %s OR patient_code ILIKE %s)")
+        params.extend([pattern, pattern])
+    if code_prefix:
+        clauses.append("patient_code LIKE %s")
+        params.append(f"{_escape_like(code_prefix)}%")
+    if exclude_prefix:
+        clauses.append("patient_code NOT LIKE %s")
+        params.append(f"{_escape_like(exclude_prefix)}%")
+    return clauses, params
+
+
+# ===== LIST =====
+def list_patients(user_id=None, after=None, limit=PAGE_SIZE, search=None, code_prefix=None, exclude_prefix=None):
+    """Satu page patients terbaru dahulu -> (rows, next_cursor)
+
+    rows = (id, patient_code, full_name, age, gender, created_at).
+    after = cursor (created_at, id) dari page sebelumnya; next_cursor None
+    bila tiada page lagi.
+    """
+    with connection() as conn:
+        clauses, params = _filters(conn, user_id, search, code_prefix, exclude_prefix)
+        if after is not None:
+            # Row comparison - guna index (created_at DESC, id DESC) terus, tiada OFFSET
+            clauses.append("(created_at, id) < (%s, %s)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT {LIST_COLUMNS}
+            FROM patients
+            {where}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        """, (*params, limit + 1))
+        rows = cur.fetchall()
+        cur.close()
+
+    # Satu row lebih untuk tahu jika ada page seterusnya
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1][5], rows[-1][0])
+    return rows, None
+
+
+def get_patient(patient_code, user_id=None):
+    """Satu patient ikut code (columns list view) atau None"""
+    with connection() as conn:
+        clauses, params = _filters(conn, user_id)
+        clauses.append("patient_code = %s")
+        cur = conn.cursor()
+        cur.execute(f"SELECT {LIST_COLUMNS} FROM patients WHERE {' AND '.join(clauses)}", (*params, patient_code))
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+
+def get_patient_details(patient_id):
+    """contact_info & medical_history untuk satu row yang dibuka -> dict atau None"""
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT contact_info, medical_history FROM patients WHERE id = %s", (patient_id,))
+        row = cur.fetchone()
+        cur.close()
+    if row is None:
+        return None
+    return {'contact_info': row[0], 'medical_history': row[1]}
+
+
+# ===== STATS =====
+def patient_stats(user_id=None, code_prefix=None):
+    """Aggregate dalam SQL -> dict (total, male, female, average_age, sample)"""
+    with connection() as conn:
+        clauses, params = _filters(conn, user_id, code_prefix=code_prefix)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT COUNT(*),
+                   COUNT(*) FILTER (WHERE gender = 'Male'),
+                   COUNT(*) FILTER (WHERE gender = 'Female'),
+                   AVG(age),
+                   COUNT(*) FILTER (WHERE patient_code LIKE 'SMP%%')
+            FROM patients
+            {where}
+        """, params)
+        row = cur.fetchone()
+        cur.close()
+    return {
+        'total': row[0],
+        'male': row[1],
+        'female': row[2],
+        'average_age': float(row[3]) if row[3] is not None else None,
+        'sample': row[4]
+    }
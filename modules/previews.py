@@ -0,0 +1,178 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from utils.helpers import get_setting
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Quality verdict ikut content hash - dict kecil, had ikut jumlah entries
+QUALITY_ENTRIES = 256
+_quality = OrderedDict()
+_quality_lock = threading.Lock()
+
+
+def content_key(image_bytes):
+    """sha256 bytes upload - sama macam result cache, jadi rerun tidak encode semula"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _preview_format():
+    """WebP jika PIL ada codec, kalau tidak JPEG"""
+    from PIL import features
+
+    fmt = str(get_setting("analysis.previews.format", "webp")).upper()
+    if fmt == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return "WEBP" if fmt == "WEBP" else "JPEG"
+
+
+def encode_preview(image, max_size=None):
+    """PIL image / RGB array -> bytes WebP/JPEG kecil (sisi terpanjang <= max_size)"""
+    from PIL import Image
+
+    max_size = max_size or get_setting("analysis.previews.max_size", 640)
+    if not hasattr(image, "thumbnail"):
+        image = Image.fromarray(image)
+    else:
+        image = image.copy()
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    out = io.BytesIO()
+    image.save(out, _preview_format(), quality=get_setting("analysis.previews.quality", 80))
+    return out.getvalue()
+
+
+# ===== PREVIEW CACHE =====
+class PreviewCache:
+    """LRU dalam memory untuk preview yang sudah di-encode, had ikut jumlah bytes"""
+
+    def __init__(self, max_mb=64):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, create):
+        """Return bytes cached untuk key; create() hanya dipanggil bila miss (None tidak di-cache)"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        # Encode di luar lock - rerun lain tidak tunggu
+        value = create()
+        if value is None:
+            return None
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self._size += len(value)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_mb': round(self._size / 2 ** 20, 2)
+            }
+
+
+def get_preview_cache():
+    """Get shared preview cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PreviewCache(get_setting("analysis.previews.memory_mb", 64))
+    return _cache
+
+
+# ===== PREVIEWS =====
+def get_preview(image_bytes, image=None, max_size=None):
+    """Bytes upload -> preview bytes untuk st.image, dibuat sekali setiap upload
+
+    image = upload yang sudah di-decode (jika ada) supaya tidak decode semula.
+    """
+    max_size = max_size or get_setting("analysis.previews.max_size", 640)
+
+    def create():
+        source = image
+        if source is None:
+            from modules.preprocessing import decode_image
+            source = decode_image(io.BytesIO(image_bytes), (max_size, max_size))
+        return encode_preview(source, max_size)
+
+    return get_preview_cache().get_or_create(f"{content_key(image_bytes)}:{max_size}", create)
+
+
+def get_upload_quality(image_bytes, image=None):
+    """assess_quality sekali setiap upload, cached ikut content hash macam preview
+
+    Miss decode upload dekat saiz quality (JPEG draft mode) jika image tiada.
+    """
+    key = content_key(image_bytes)
+    with _quality_lock:
+        if key in _quality:
+            _quality.move_to_end(key)
+            return _quality[key]
+
+    from modules.quality import assess_quality
+
+    if image is None:
+        from modules.preprocessing import decode_image
+        size = get_setting("analysis.quality.size", 256)
+        image = decode_image(io.BytesIO(image_bytes), (size, size))
+    quality = assess_quality(image)
+
+    with _quality_lock:
+        _quality[key] = quality
+        while len(_quality) > QUALITY_ENTRIES:
+            _quality.popitem(last=False)
+    return quality
+
+
+def preview_pixels(image_bytes, image=None):
+    """Preview yang di-decode semula -> RGB uint8 array (base kecil untuk overlay)"""
+    import numpy as np
+    from PIL import Image
+
+    with Image.open(io.BytesIO(get_preview(image_bytes, image))) as preview:
+        return np.asarray(preview.convert("RGB"))
+
+
+def get_overlay_preview(analysis_id, load_masks, image_bytes=None, image=None):
+    """Overlay segmentation yang sudah di-encode, cached ikut analysis + upload
+
+    load_masks(analysis_id) hanya dipanggil bila miss; base = preview kecil,
+    bukan image resolusi penuh.
+    """
+    digest = content_key(image_bytes) if image_bytes is not None else "plain"
+
+    def create():
+        from modules.overlay import render_overlay
+
+        loaded = load_masks(analysis_id)
+        if loaded is None:
+            return None
+        base = preview_pixels(image_bytes, image) if image_bytes is not None else None
+        return encode_preview(render_overlay(loaded[0], base))
+
+    return get_preview_cache().get_or_create(f"overlay:{analysis_id}:{digest}", create)
@@ -0,0 +1,149 @@
+import time
+
+import numpy as np
+
+from utils.helpers import get_setting
+
+# Grade ikut column scan_quality dalam data/ear_segmentation_history.csv (+ Poor = tolak)
+QUALITY_GRADES = ("Excellent", "Good", "Fair", "Poor")
+
+# Julat kulit dalam YCrCb (Cr, Cb) - anggaran kasar ear dalam frame
+SKIN_CR = (133, 173)
+SKIN_CB = (77, 127)
+
+# Kernel Immerkaer - anggaran sigma noise tanpa dipengaruhi edges biasa
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+
+def _downscale(image, size):
+    """PIL image -> uint8 RGB array dengan sisi terpanjang = size
+
+    Nearest sampling ke 2x size (hanya pixel yang diambil dibaca), kemudian
+    purata 2x2 - jauh lebih murah dari resample penuh untuk image besar.
+    """
+    from PIL import Image
+
+    width, height = image.size
+    scale = size / max(width, height)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if scale < 0.5:
+        image = image.resize((target[0] * 2, target[1] * 2), Image.Resampling.NEAREST).reduce(2)
+    elif scale != 1:
+        # Image kecil - resample terus; skala tetap supaya variance Laplacian setanding
+        image = image.resize(target, Image.Resampling.BILINEAR)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def estimate_noise(gray):
+    """Sigma noise (gray levels 0-255) dari uint8 gray - Immerkaer (1996)"""
+    import cv2
+
+    height, width = gray.shape
+    if height < 3 or width < 3:
+        return 0.0
+    response = cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL)[1:-1, 1:-1]
+    return float(np.abs(response).sum() * np.sqrt(np.pi / 2) / (6.0 * (width - 2) * (height - 2)))
+
+
+def largest_skin_region(skin):
+    """Boolean skin mask -> (pecahan frame, fill bbox) untuk connected component terbesar
+
+    Pixel kulit berselerak (noise, latar bercorak) tidak membentuk satu
+    component besar - ear sebenar ialah satu kawasan padat.
+    """
+    import cv2
+
+    if not skin.any():
+        return 0.0, 0.0
+    # Opening 3x3 buang titik terpencil sebelum label
+    mask = cv2.morphologyEx(skin.astype(np.uint8), cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count <= 1:
+        return 0.0, 0.0
+    largest = 1 + int(stats[1:, cv2.CC_STAT_AREA].argmax())
+    area = float(stats[largest, cv2.CC_STAT_AREA])
+    box = float(stats[largest, cv2.CC_STAT_WIDTH] * stats[largest, cv2.CC_STAT_HEIGHT])
+    return area / skin.size, area / box
+
+
+# ===== QUALITY GATE =====
+def assess_quality(image):
+    """Pre-check murah atas salinan kecil image -> dict (grade, usable, metrics, issues)
+
+    blur      : variance Laplacian (rendah = kabur)
+    noise     : sigma noise - variance tinggi dari noise bukan ketajaman
+    exposure  : purata kecerahan & pecahan pixel terlalu gelap/terang
+    ear       : component kulit terbesar di bahagian tengah frame (saiz & fill)
+    Grade Poor bermaksud usable=False - caller patut skip inference.
+    """
+    import cv2
+
+    start = time.perf_counter()
+    pixels = _downscale(image, get_setting("analysis.quality.size", 256))
+
+    gray = cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+    blur = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    noise = estimate_noise(gray)
+    brightness = float(gray.mean()) / 255.0
+    dark_fraction = float((gray < 16).mean())
+    bright_fraction = float((gray > 240).mean())
+
+    # Ear biasanya di tengah frame - kira kulit dalam 60% tengah sahaja
+    height, width = gray.shape
+    top, left = int(height * 0.2), int(width * 0.2)
+    ycrcb = cv2.cvtColor(pixels[top:height - top, left:width - left], cv2.COLOR_RGB2YCrCb)
+    cr, cb = ycrcb[..., 1], ycrcb[..., 2]
+    skin = (cr >= SKIN_CR[0]) & (cr <= SKIN_CR[1]) & (cb >= SKIN_CB[0]) & (cb <= SKIN_CB[1])
+    skin_fraction = float(skin.mean()) if skin.size else 0.0
+    ear_fraction, ear_fill = largest_skin_region(skin)
+
+    issues = []
+    if blur < get_setting("analysis.quality.min_blur", 10.0):
+        issues.append("Image is too blurry")
+    max_noise = get_setting("analysis.quality.max_noise", 15.0)
+    if noise > max_noise:
+        issues.append("Image is too noisy")
+    if brightness < get_setting("analysis.quality.min_brightness", 0.15) \
+            or dark_fraction > get_setting("analysis.quality.max_clipped", 0.5):
+        issues.append("Image is too dark")
+    if brightness > get_setting("analysis.quality.max_brightness", 0.9) \
+            or bright_fraction > get_setting("analysis.quality.max_clipped", 0.5):
+        issues.append("Image is overexposed")
+    if ear_fraction < get_setting("analysis.quality.min_skin_fraction", 0.1) \
+            or ear_fill < get_setting("analysis.quality.min_ear_fill", 0.3):
+        issues.append("No ear detected in the centre of the frame")
+
+    # Skor 0-1 setiap aspek, grade ikut purata
+    # Laplacian variance tinggi kerana noise bukan ketajaman - turun sehingga 0 pada max_noise
+    sharpness = min(1.0, blur / get_setting("analysis.quality.good_blur", 150.0)) \
+        * max(0.0, 1.0 - noise / max_noise)
+    exposure = max(0.0, 1.0 - abs(brightness - 0.5) * 2) * (1.0 - max(dark_fraction, bright_fraction))
+    ear = min(1.0, ear_fraction / get_setting("analysis.quality.good_skin_fraction", 0.4))
+    score = (sharpness + exposure + ear) / 3
+
+    if issues:
+        grade = "Poor"
+    elif score >= 0.8:
+        grade = "Excellent"
+    elif score >= 0.6:
+        grade = "Good"
+    else:
+        grade = "Fair"
+
+    return {
+        'grade': grade,
+        'usable': grade != "Poor",
+        'score': round(score, 3),
+        'blur': round(blur, 1),
+        'noise': round(noise, 2),
+        'brightness': round(brightness, 3),
+        'dark_fraction': round(dark_fraction, 3),
+        'bright_fraction': round(bright_fraction, 3),
+        'skin_fraction': round(skin_fraction, 3),
+        'ear_fraction': round(ear_fraction, 3),
+        'ear_fill': round(ear_fill, 3),
+        'issues': issues,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
@@ -0,0 +1,225 @@
+import argparse
+import glob
+import os
+import threading
+import time
+
+import numpy as np
+
+from modules.ear_analysis import (
+    EAR_REGIONS, MASK_THRESHOLD, MODEL_INPUT_SIZE, MODEL_PATH,
+    EarSegmentationEngine, model_file_version, prepare_input
+)
+from modules.coverage import compute_coverage_batch
+from utils.helpers import get_setting
+
+QUANTIZATION_MODES = ("float16", "int8")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def default_artifact_path(mode, model_path=MODEL_PATH):
+    """ear_segmentation_model.keras -> ear_segmentation_model_<mode>.tflite"""
+    return f"{os.path.splitext(model_path)[0]}_{mode}.tflite"
+
+
+# ===== EXPORT =====
+def load_images(image_dir, limit=None):
+    """Load dan preprocess images dari directory -> list [512,512,3]"""
+    from PIL import Image
+
+    paths = sorted(
+        p for p in glob.glob(os.path.join(image_dir, "*"))
+        if p.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if limit:
+        paths = paths[:limit]
+    return [prepare_input(Image.open(p)) for p in paths]
+
+
+def synthetic_images(count, seed=0):
+    """Smooth random images untuk calibration/parity bila tiada scan sebenar"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        low = rng.random((16, 16, 3), dtype=np.float32)
+        images.append(cv2.resize(low, (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), interpolation=cv2.INTER_CUBIC).clip(0, 1))
+    return images
+
+
+def export_tflite(mode="float16", model_path=MODEL_PATH, output_path=None, calibration_images=None):
+    """Convert model .keras ke TFLite float16 atau int8 artifact"""
+    import tensorflow as tf
+    from tensorflow import keras
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    output_path = output_path or default_artifact_path(mode, model_path)
+    model = keras.models.load_model(model_path, compile=False)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        # int8 weights & activations perlukan representative dataset untuk calibration
+        if not calibration_images:
+            calibration_images = synthetic_images(16)
+
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+    return output_path
+
+
+# ===== TFLITE RUNTIME BACKEND =====
+def _load_interpreter(artifact_path, num_threads=None):
+    """Guna LiteRT jika ada, fallback ke tf.lite (tensorflow-cpu)"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=artifact_path, num_threads=num_threads)
+
+
+def _output_sort_key(name):
+    """Susun output ikut EAR_REGIONS, atau output_0..output_3 dari converter"""
+    if name in EAR_REGIONS:
+        return EAR_REGIONS.index(name)
+    return int(name.rsplit("_", 1)[-1])
+
+
+class TFLiteEngine:
+    """Backend TFLite dengan interface sama seperti EarSegmentationEngine"""
+
+    def __init__(self, artifact_path, num_threads=None):
+        if num_threads is None:
+            # Sama macam Keras engine: 0 = default interpreter
+            num_threads = get_setting("analysis.runtime.intra_op_threads", 0) or None
+        self.model_path = artifact_path
+        self.model_version = model_file_version(artifact_path)
+        self.interpreter = _load_interpreter(artifact_path, num_threads)
+        signature = self.interpreter.get_signature_list()["serving_default"]
+        self._input_name = signature["inputs"][0]
+        self._output_names = sorted(signature["outputs"], key=_output_sort_key)
+        # Signature runner resize input bila batch size berubah
+        self._runner = self.interpreter.get_signature_runner("serving_default")
+        # Interpreter tidak thread-safe
+        self._lock = threading.Lock()
+
+    def predict_batch(self, batch):
+        """Run satu forward pass untuk batch [N,512,512,3] -> [N,512,512,4]"""
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            outputs = self._runner(**{self._input_name: batch})
+            return np.concatenate([outputs[name] for name in self._output_names], axis=-1)
+
+    def warmup(self):
+        """Dummy forward pass supaya interpreter siap sebelum request pertama"""
+        self.predict_batch(np.zeros((1, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE, 3), dtype=np.float32))
+
+
+# ===== ACCURACY PARITY HARNESS =====
+def _time_predictions(engine, images, batch_size):
+    outputs = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        outputs.append(engine.predict_batch(np.stack(images[i:i + batch_size])))
+    elapsed = time.perf_counter() - start
+    return np.concatenate(outputs), elapsed * 1000.0 / len(images)
+
+
+def compare_backends(reference, candidate, images, batch_size=4):
+    """Banding masks & coverage candidate backend dengan float32 model
+
+    Return IoU/Dice per region, purata coverage delta (percentage points)
+    dan latency per image bagi kedua-dua backend.
+    """
+    reference.warmup()
+    candidate.warmup()
+    ref_probs, ref_ms = _time_predictions(reference, images, batch_size)
+    cand_probs, cand_ms = _time_predictions(candidate, images, batch_size)
+
+    ref_masks = ref_probs >= MASK_THRESHOLD
+    cand_masks = cand_probs >= MASK_THRESHOLD
+
+    # Kira semua region & images sekaligus - axis (H, W)
+    intersection = np.logical_and(ref_masks, cand_masks).sum(axis=(1, 2))
+    union = np.logical_or(ref_masks, cand_masks).sum(axis=(1, 2))
+    totals = ref_masks.sum(axis=(1, 2)) + cand_masks.sum(axis=(1, 2))
+    iou = np.where(union > 0, intersection / np.maximum(union, 1), 1.0)
+    dice = np.where(totals > 0, 2 * intersection / np.maximum(totals, 1), 1.0)
+    # Coverage % sama macam yang disimpan (argmax-resolved, ear_segmentation_history.csv)
+    n_regions = len(EAR_REGIONS)
+    coverage_delta = np.abs(
+        compute_coverage_batch(ref_probs)[:, :n_regions] - compute_coverage_batch(cand_probs)[:, :n_regions]
+    )
+
+    regions = {}
+    for i, region in enumerate(EAR_REGIONS):
+        regions[region] = {
+            'iou': float(iou[:, i].mean()),
+            'dice': float(dice[:, i].mean()),
+            'coverage_delta': float(coverage_delta[:, i].mean())
+        }
+
+    return {
+        'images': len(images),
+        'reference_ms_per_image': ref_ms,
+        'candidate_ms_per_image': cand_ms,
+        'speedup': ref_ms / cand_ms if cand_ms else 0.0,
+        'mean_iou': float(iou.mean()),
+        'mean_dice': float(dice.mean()),
+        'max_coverage_delta': float(coverage_delta.max()),
+        'regions': regions
+    }
+
+
+def print_report(mode, report):
+    """Print parity report dalam format jadual ringkas"""
+    print(f"Backend: tflite_{mode} vs keras float32 ({report['images']} images)")
+    print(f"Latency: {report['reference_ms_per_image']:.1f} ms -> "
+          f"{report['candidate_ms_per_image']:.1f} ms per image ({report['speedup']:.2f}x)")
+    print(f"{'Region':<12}{'IoU':>8}{'Dice':>8}{'dCov %':>10}")
+    for region, metrics in report['regions'].items():
+        print(f"{region:<12}{metrics['iou']:>8.4f}{metrics['dice']:>8.4f}{metrics['coverage_delta']:>10.3f}")
+    print(f"{'mean':<12}{report['mean_iou']:>8.4f}{report['mean_dice']:>8.4f}{report['max_coverage_delta']:>10.3f} (max)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export & validate quantized ear segmentation model")
+    parser.add_argument("command", choices=["export", "compare"])
+    parser.add_argument("--mode", choices=QUANTIZATION_MODES, default="float16")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", help="Path artifact .tflite")
+    parser.add_argument("--images", help="Directory images untuk calibration/parity")
+    parser.add_argument("--limit", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.limit) if args.images else synthetic_images(args.limit)
+    artifact = args.output or default_artifact_path(args.mode, args.model)
+
+    if args.command == "export":
+        path = export_tflite(args.mode, args.model, artifact, calibration_images=images)
+        print(f"Exported {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+    else:
+        report = compare_backends(
+            EarSegmentationEngine(args.model),
+            TFLiteEngine(artifact, num_threads=args.threads),
+            images
+        )
+        print_report(args.mode, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from utils.helpers import BASE_DIR, get_setting
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Eviction disk turun ke pecahan ini dari disk_max_mb
+DISK_LOW_WATER = 0.9
+
+
+def make_key(image_bytes, model_version, variant=""):
+    """Content-addressed key: sha256(bytes upload) + model version (+ variant, contoh 'tiled')"""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    key = f"{digest}:{model_version}"
+    return f"{key}:{variant}" if variant else key
+
+
+# ===== ANALYSIS RESULT CACHE =====
+class AnalysisResultCache:
+    """Cache dua tier: LRU dalam memory + JSON files atas disk dengan had saiz
+
+    Memory tier dihadkan ikut jumlah entries dan bytes (saiz JSON) - result
+    tiled membawa mask_data beberapa MB.
+    """
+
+    def __init__(self, memory_entries=128, disk_dir=None, disk_max_mb=256, memory_max_mb=32):
+        self.memory_entries = memory_entries
+        self.memory_max_bytes = int(memory_max_mb * 1024 * 1024)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()  # key -> (value, saiz bytes)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # jumlah saiz fail - scan sekali, kemudian dikemas kini setiap put
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        # ':' tidak sesuai untuk nama fail di semua platform
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.json")
+
+    def _remember(self, key, value, size):
+        if size > self.memory_max_bytes:
+            # Terlalu besar untuk memory tier - disk sahaja
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= old[1]
+        self._memory[key] = (value, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.memory_entries or self._memory_bytes > self.memory_max_bytes:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted
+
+    def get(self, key):
+        """Return cached result atau None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key][0]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path) as f:
+                    data = f.read()
+                value = json.loads(data)
+                # Touch supaya eviction ikut last access (LRU atas disk)
+                os.utime(path)
+            except (OSError, ValueError):
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value, len(data))
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Simpan result (mesti JSON-serializable) dalam kedua-dua tier"""
+        # Serialize sekali - saiz untuk memory tier, kandungan untuk disk
+        data = json.dumps(value, default=str)
+        with self._lock:
+            self._remember(key, value, len(data))
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    f.write(data)
+                try:
+                    replaced = os.path.getsize(path)
+                except OSError:
+                    replaced = 0
+                os.replace(tmp_path, path)
+                written = os.path.getsize(path)
+            except OSError as e:
+                print(f"Result cache write warning: {e}")
+                return
+
+            with self._lock:
+                if self._disk_bytes is None:
+                    self._disk_bytes = self._scan_disk_bytes()
+                else:
+                    self._disk_bytes += written - replaced
+                over = self._disk_bytes > self.disk_max_bytes
+            # Scan penuh hanya bila jumlah melebihi had
+            if over:
+                self._evict_disk()
+
+    def _scan_disk_bytes(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.disk_dir) if entry.name.endswith(".json"))
+
+    def _evict_disk(self):
+        """Buang fail paling lama tidak diakses sehingga bawah 90% disk_max_bytes
+
+        Ruang 10% supaya put seterusnya tidak terus scan direktori semula.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > self.disk_max_bytes:
+            for _, size, path in sorted(entries):
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                if total <= self.disk_max_bytes * DISK_LOW_WATER:
+                    break
+        # Betulkan running total (process lain mungkin tulis ke direktori sama)
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self):
+        """Hit/miss counters untuk sizing cache"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes
+            }
+
+
+def get_result_cache():
+    """Get shared cache (None jika disabled dalam config.yaml)"""
+    global _cache
+    if not get_setting("analysis.cache.enabled", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                disk_dir = get_setting("analysis.cache.disk_dir", "cache/analysis")
+                if disk_dir and not os.path.isabs(disk_dir):
+                    disk_dir = os.path.join(BASE_DIR, disk_dir)
+                _cache = AnalysisResultCache(
+                    memory_entries=get_setting("analysis.cache.memory_entries", 128),
+                    disk_dir=disk_dir,
+                    disk_max_mb=get_setting("analysis.cache.disk_max_mb", 256),
+                    memory_max_mb=get_setting("analysis.cache.memory_max_mb", 32)
+                )
+    return _cache
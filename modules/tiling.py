@@ -0,0 +1,101 @@
+import numpy as np
+
+from modules.ear_analysis import EAR_REGIONS, MODEL_INPUT_SIZE
+
+# Setiap pixel: image uint8 RGB (3) + accumulator float32 x4 regions (16) + weight float32 (4)
+BYTES_PER_PIXEL = 3 + 4 * len(EAR_REGIONS) + 4
+
+# Satu batch tiles wujud beberapa kali: buffer input, salinan tensor dalam engine, output model
+TILE_BATCH_COPIES = 3
+
+
+# ===== MEMORY BUDGET =====
+def tile_batch_bytes(batch_size, tile_size=MODEL_INPUT_SIZE):
+    """Memory untuk satu batch tiles: input [N,T,T,3] + output [N,T,T,4] float32 (termasuk salinan)"""
+    return TILE_BATCH_COPIES * batch_size * tile_size * tile_size * (3 + len(EAR_REGIONS)) * 4
+
+
+def estimate_peak_bytes(width, height, batch_size=4, tile_size=MODEL_INPUT_SIZE):
+    """Anggaran peak memory buffers tiled inference untuk image width x height
+
+    Hanya arrays numpy (image, accumulator, weights, batch tiles) - memory
+    activation TensorFlow semasa forward pass tidak termasuk.
+    """
+    padded = max(width, tile_size) * max(height, tile_size)
+    return padded * BYTES_PER_PIXEL + tile_batch_bytes(batch_size, tile_size)
+
+
+def fit_to_budget(width, height, max_memory_mb, batch_size=4, tile_size=MODEL_INPUT_SIZE):
+    """Saiz (width, height) terbesar yang buffers muat dalam max_memory_mb, kekalkan aspect ratio
+
+    batch_size = tiles setiap forward pass (tiled inference tidak melalui scheduler).
+    """
+    budget = max_memory_mb * 1024 * 1024 - tile_batch_bytes(batch_size, tile_size)
+    max_pixels = max(budget // BYTES_PER_PIXEL, tile_size * tile_size)
+    if width * height <= max_pixels:
+        return width, height
+    scale = (max_pixels / float(width * height)) ** 0.5
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+# ===== TILING =====
+def tile_starts(length, tile_size, overlap):
+    """Start positions supaya tiles overlap dan tile terakhir rapat ke hujung"""
+    if length <= tile_size:
+        return [0]
+    stride = tile_size - overlap
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+
+def blend_window(tile_size, overlap):
+    """Weight 2D: 1 di tengah, menurun secara linear dalam kawasan overlap"""
+    ramp = np.ones(tile_size, dtype=np.float32)
+    if overlap > 0:
+        edge = (np.arange(overlap, dtype=np.float32) + 1) / (overlap + 1)
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge[::-1]
+    return np.outer(ramp, ramp)
+
+
+def tiled_predict(image_array, predict_fn, tile_size=MODEL_INPUT_SIZE, overlap=64, batch_size=4):
+    """Run model atas tiles yang bertindih dan blend semula -> [H,W,4]
+
+    image_array: uint8 [H,W,3] pada resolusi penuh (sudah fit_to_budget).
+    Hanya satu batch tiles wujud dalam memory pada satu masa.
+    """
+    height, width = image_array.shape[:2]
+
+    # Image lebih kecil dari satu tile - pad ke tile_size
+    pad_h = max(0, tile_size - height)
+    pad_w = max(0, tile_size - width)
+    if pad_h or pad_w:
+        image_array = np.pad(image_array, ((0, pad_h), (0, pad_w), (0, 0)), mode="edge")
+    padded_h, padded_w = image_array.shape[:2]
+
+    accumulator = np.zeros((padded_h, padded_w, len(EAR_REGIONS)), dtype=np.float32)
+    weights = np.zeros((padded_h, padded_w), dtype=np.float32)
+    window = blend_window(tile_size, overlap)
+
+    positions = [
+        (y, x)
+        for y in tile_starts(padded_h, tile_size, overlap)
+        for x in tile_starts(padded_w, tile_size, overlap)
+    ]
+
+    batch = np.empty((batch_size, tile_size, tile_size, 3), dtype=np.float32)
+    weighted = np.empty((tile_size, tile_size, len(EAR_REGIONS)), dtype=np.float32)
+    for i in range(0, len(positions), batch_size):
+        chunk = positions[i:i + batch_size]
+        for j, (y, x) in enumerate(chunk):
+            np.multiply(image_array[y:y + tile_size, x:x + tile_size], 1.0 / 255.0, out=batch[j])
+
+        outputs = predict_fn(batch[:len(chunk)])
+        for j, (y, x) in enumerate(chunk):
+            np.multiply(outputs[j], window[..., np.newaxis], out=weighted)
+            accumulator[y:y + tile_size, x:x + tile_size] += weighted
+            weights[y:y + tile_size, x:x + tile_size] += window
+
+    accumulator /= weights[..., np.newaxis]
+    return accumulator[:height, :width]
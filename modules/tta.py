@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+
+# ===== TEST-TIME AUGMENTATION =====
+def _resize(array, size):
+    interpolation = cv2.INTER_AREA if size < array.shape[0] else cv2.INTER_LINEAR
+    return cv2.resize(array, (size, size), interpolation=interpolation)
+
+
+def _scaled_view(inputs, scale):
+    """Zoom image [S,S,3] sekitar tengah; return (view, box) - box = kawasan asal yang diliputi view"""
+    size = inputs.shape[0]
+    scaled = int(round(size * scale))
+    offset = abs(size - scaled) // 2
+    resized = _resize(inputs, scaled)
+
+    if scale < 1:
+        # Zoom out: image kecil di tengah, tepi di-pad (edge)
+        pad = ((offset, size - scaled - offset), (offset, size - scaled - offset), (0, 0))
+        return np.pad(resized, pad, mode="edge"), (0, size)
+    # Zoom in: crop tengah, hanya kawasan tengah image asal diliputi
+    view = resized[offset:offset + size, offset:offset + size]
+    inner = int(round(size / scale))
+    start = (size - inner) // 2
+    return view, (start, start + inner)
+
+
+def build_tta_batch(inputs, scales=(0.9, 1.1)):
+    """Satu input [S,S,3] -> batch [2 + len(scales), S, S, 3]: asal, flip mendatar, scale variants"""
+    views = [inputs, inputs[:, ::-1]]
+    boxes = [None, None]
+    for scale in scales:
+        view, box = _scaled_view(inputs, scale)
+        views.append(view)
+        boxes.append(box)
+    return np.stack(views), boxes
+
+
+def merge_tta_outputs(outputs, boxes, scales=(0.9, 1.1)):
+    """Undo augmentation pada outputs [K,S,S,R] dan purata -> [S,S,R]"""
+    size = outputs.shape[1]
+    aligned = np.zeros_like(outputs)
+    weights = np.zeros(outputs.shape[:3] + (1,), dtype=np.float32)
+
+    # Asal & flip: un-flip dengan slicing (view, tiada salinan)
+    aligned[0] = outputs[0]
+    aligned[1] = outputs[1][:, ::-1]
+    weights[:2] = 1.0
+
+    for k, (scale, (start, stop)) in enumerate(zip(scales, boxes[2:]), 2):
+        if scale < 1:
+            scaled = int(round(size * scale))
+            offset = (size - scaled) // 2
+            aligned[k] = _resize(outputs[k][offset:offset + scaled, offset:offset + scaled], size)
+            weights[k] = 1.0
+        else:
+            aligned[k, start:stop, start:stop] = _resize(outputs[k], stop - start)
+            weights[k, start:stop, start:stop] = 1.0
+
+    # Purata berwajaran atas semua augmentations sekaligus
+    return (aligned * weights).sum(axis=0) / weights.sum(axis=0)
@@ -2,6 +2,7 @@ import streamlit as st
 import psycopg2
 import os
 from dotenv import load_dotenv
+from database.models import migrate
 
 # Page configuration
 st.set_page_config(
@@ -129,55 +130,13 @@ def initialize_database():
     try:
         database_url = os.getenv('DATABASE_URL')
         conn = psycopg2.connect(database_url)
-        cur = conn.cursor()
         
-        # Create users table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                name VARCHAR(100) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                role VARCHAR(20) DEFAULT 'practitioner',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create other tables
-        tables_sql = [
-            """
-            CREATE TABLE IF NOT EXISTS patients (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                patient_code VARCHAR(50) UNIQUE NOT NULL,
-                full_name VARCHAR(100) NOT NULL,
-                age INTEGER,
-                gender VARCHAR(10),
-                contact_info TEXT,
-                medical_history TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS analysis_sessions (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER REFERENCES users(id),
-                patient_id INTEGER REFERENCES patients(id),
-                session_code VARCHAR(50) UNIQUE NOT NULL,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        ]
-        
-        for sql in tables_sql:
-            cur.execute(sql)
-        
-        conn.commit()
-        cur.close()
+        # Tables & indexes dari migrations bernombor (database/models.py)
+        applied = migrate(conn)
         conn.close()
         
+        if applied:
+            st.write(f"**Applied migrations:** {', '.join(str(v) for v in applied)}")
         st.success("✅ Database tables created successfully!")
         return True
         
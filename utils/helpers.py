@@ -1 +1,45 @@
+import os
+import threading
 
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, "config.yaml")
+
+_config = None
+_config_lock = threading.Lock()
+
+
+# ===== CONFIGURATION =====
+def load_config():
+    """Load config.yaml sekali per process"""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                try:
+                    with open(CONFIG_PATH) as f:
+                        _config = yaml.safe_load(f) or {}
+                except Exception as e:
+                    print(f"Config load warning: {e}")
+                    _config = {}
+    return _config
+
+
+def get_setting(path, default=None):
+    """Get nested setting dari config.yaml, contoh: get_setting('analysis.batching.window_ms', 15)"""
+    value = load_config()
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return default
+        value = value[key]
+    return value
+
+
+def set_setting(path, value):
+    """Override setting dalam process ini sahaja (config.yaml tidak diubah)"""
+    config = load_config()
+    keys = path.split(".")
+    for key in keys[:-1]:
+        config = config.setdefault(key, {})
+    config[keys[-1]] = value